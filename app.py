@@ -1,20 +1,32 @@
 import streamlit as st
-import pandas as pd
-import requests
-import io
-import plotly.express as px
-import time
-import re
+import numpy as np
 import os
+import sys
+import time
+import hmac
+import argparse
+import tempfile
+from functools import partial
 from datetime import datetime
-from groq import Groq
-from tavily import TavilyClient 
-from fpdf import FPDF
+from titan.config import RESEARCH_TTL_DAYS, REFRESH_INTERVAL, PREANALISIS_WORKERS, EXPORT_WORKERS, EXPORT_PDF_FORMATS, EXPORT_PDF_UNICO_MAX, EXPORT_DATA_FORMATS, ALERTA_DIAS
+from titan.clientes import build_clients
+from titan.datos import DatasetRefresher
+from titan.exportacion import exportar_datos, EXPORT_MIME
+from titan.busqueda import RowCache, SearchIndex, FilterEngine, filtrar
+from titan.presentacion import presentacion, urgencia, orden_plazo, agregados, figuras_analitica, estilos, logo_bytes
+from titan.investigacion import ResearchStore, PreanalisisJob, investigar_stream, seleccionar_para_preanalisis, preanalizar
+from titan.usuarios import UserStore
+from titan.alertas import MotorAlertas
+from titan.perfil import MatchIndex, puntuar_perfil, perfil_vacio
+from titan.metricas import metricas, configurar_log, VENTANA_METRICAS
 
 # ==============================================================================
 # 0. CONFIGURACIÓN GLOBAL Y LOGO
 # ==============================================================================
-LOGO_FILE = "logo.png" 
+# La lógica sin Streamlit vive en el paquete titan/ (importable desde tests y benchmarks);
+# aquí quedan la UI y las cachés de proceso/sesión que la envuelven.
+SORT_OPTIONS = {"Relevancia": None, "Plazo de cierre": "deadline", "Cuantía": "amount", "Probabilidad": "prob_rank"}
+PAGE_SIZES = [10, 20, 50]
 
 st.set_page_config(
     page_title="Radar Subvenciones | TITAN X",
@@ -26,385 +38,360 @@ st.set_page_config(
 # ==============================================================================
 # 2. CSS DINÁMICO (TITAN ADAPTIVE THEME)
 # ==============================================================================
-st.markdown("""
-    <style>
-    /* IMPORTACIÓN DE FUENTES */
-    @import url('https://fonts.googleapis.com/css2?family=Rajdhani:wght@500;600;700;800&family=Outfit:wght@300;400;700;900&display=swap');
-
-    /* --- VARIABLES DE COLORES --- */
-    :root {
-        --bg-app: #f8fafc;
-        --card-bg: #ffffff;
-        --card-border: #e2e8f0;
-        --text-primary: #0f172a;
-        --text-secondary: #64748b;
-        --accent: #06b6d4;
-        --primary-btn: #3b82f6;
-        --shadow-card: 0 4px 6px -1px rgba(0, 0, 0, 0.05);
-        --metric-bg: rgba(255, 255, 255, 0.7);
-        --input-bg: #ffffff;
-        --urgent-red: #ef4444;
-    }
-
-    @media (prefers-color-scheme: dark) {
-        :root {
-            --bg-app: #0f172a;
-            --card-bg: #1e293b;
-            --card-border: #334155;
-            --text-primary: #f8fafc;
-            --text-secondary: #94a3b8;
-            --accent: #22d3ee;
-            --primary-btn: #60a5fa;
-            --shadow-card: 0 10px 15px -3px rgba(0, 0, 0, 0.5);
-            --metric-bg: rgba(30, 41, 59, 0.7);
-            --input-bg: #1e293b;
-        }
-    }
-
-    /* --- ANIMACIÓN PARPADEO (CIERRE INMINENTE) --- */
-    @keyframes blinker {
-        50% { opacity: 0.3; }
-    }
-    .blink-urgent {
-        animation: blinker 1s linear infinite;
-        background: var(--urgent-red) !important;
-        color: white !important;
-        border: 1px solid white !important;
-    }
-
-    .stApp { font-family: 'Outfit', sans-serif; background-color: var(--bg-app); }
-    h1, h2, h3 { font-family: 'Outfit', sans-serif !important; font-weight: 800 !important; color: var(--text-primary) !important; }
-    
-    .titan-header {
-        background: -webkit-linear-gradient(0deg, var(--primary-btn), var(--accent));
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-        font-size: 3rem; font-weight: 900; margin-bottom: 0px;
-    }
-
-    /* --- ESTILOS DE KPIS --- */
-    div[data-testid="metric-container"] {
-        background-color: var(--metric-bg); 
-        border: 1px solid var(--card-border);
-        padding: 15px 20px; 
-        border-radius: 12px; 
-        backdrop-filter: blur(10px);
-        box-shadow: var(--shadow-card);
-        transition: all 0.3s ease;
-    }
-    div[data-testid="metric-container"]:hover { 
-        border-color: var(--accent); 
-        transform: translateY(-2px); 
-        box-shadow: 0 8px 20px rgba(0,0,0,0.1);
-    }
-    
-    [data-testid="stMetricValue"] { 
-        font-family: 'Rajdhani', sans-serif !important; 
-        font-size: 2.5rem !important;
-        font-weight: 800 !important;
-        background: -webkit-linear-gradient(45deg, var(--accent), var(--primary-btn));
-        -webkit-background-clip: text;
-        -webkit-text-fill-color: transparent;
-    }
-    [data-testid="stMetricLabel"] { 
-        color: var(--text-secondary) !important; 
-        font-weight: 600 !important;
-        font-size: 0.9rem !important;
-        text-transform: uppercase;
-        letter-spacing: 1px;
-    }
-
-    .titan-card {
-        background: var(--card-bg); 
-        border-radius: 16px; 
-        border: 1px solid var(--card-border);
-        overflow: hidden; 
-        transition: all 0.4s cubic-bezier(0.175, 0.885, 0.32, 1.275);
-        margin-bottom: 20px; 
-        height: 100%; 
-        box-shadow: var(--shadow-card);
-        display: flex;
-        flex-direction: column;
-        position: relative;
-    }
-    .titan-card:hover { transform: translateY(-8px); box-shadow: 0 20px 40px -5px rgba(0,0,0,0.15); border-color: var(--primary-btn); }
-
-    .card-img-container { 
-        position: relative; 
-        height: 180px; 
-        width: 100%; 
-        overflow: hidden;
-        background-color: #0f172a; 
-        border-bottom: 1px solid var(--card-border);
-    }
-    
-    .card-img { 
-        width: 100% !important; 
-        height: 100% !important; 
-        object-fit: cover !important; 
-        object-position: center;
-        display: block;
-        transition: transform 0.5s ease; 
-        filter: brightness(0.9); 
-    }
-    .titan-card:hover .card-img { transform: scale(1.1); filter: brightness(1.05); }
-
-    .card-overlay { 
-        position: absolute; bottom: 0; left: 0; right: 0; height: 100%; 
-        background: linear-gradient(to top, var(--card-bg) 0%, transparent 60%); 
-        pointer-events: none;
-    }
-
-    /* Etiqueta Común (Badge Base) */
-    .card-badge, .urgency-badge {
-        position: absolute; 
-        top: 12px; 
-        background: rgba(15, 23, 42, 0.8); 
-        backdrop-filter: blur(8px); 
-        -webkit-backdrop-filter: blur(8px);
-        color: #ffffff !important; 
-        padding: 5px 14px;
-        border-radius: 8px; 
-        font-family: 'Rajdhani', sans-serif; 
-        font-weight: 800;
-        text-transform: uppercase;
-        letter-spacing: 1px;
-        border: 1px solid rgba(255, 255, 255, 0.15); 
-        z-index: 22; 
-        box-shadow: 0 4px 12px rgba(0,0,0,0.4);
-    }
-
-    .card-badge { right: 12px; font-size: 0.75rem; }
-
-    /* Etiqueta de Urgencia (Izquierda) - MEJORADA */
-    .urgency-badge {
-        left: 12px;
-        font-size: 0.85rem; /* Tamaño de letra más grande */
-        display: flex;
-        align-items: center;
-        gap: 6px;
-    }
-
-    .card-body { padding: 20px; position: relative; flex-grow: 1; display: flex; flex-direction: column; justify-content: space-between; }
-    
-    .card-title {
-        color: var(--text-primary); font-weight: 800; font-size: 1.15rem; line-height: 1.3;
-        margin-bottom: 12px; min-height: 3rem; display: -webkit-box; -webkit-line-clamp: 2;
-        -webkit-box-orient: vertical; overflow: hidden;
-    }
-
-    .specs-grid { display: grid; grid-template-columns: 1fr 1fr; gap: 8px; margin-top: 15px; padding-top: 15px; border-top: 1px solid var(--card-border); }
-    .spec-item { display: flex; flex-direction: column; }
-    .spec-label { font-size: 0.65rem; text-transform: uppercase; letter-spacing: 1px; color: var(--text-secondary); font-weight: 700; }
-    .spec-value { font-family: 'Rajdhani', sans-serif; font-size: 1.1rem; font-weight: 700; color: var(--text-primary); }
-
-    .titan-tag { display: inline-block; padding: 3px 8px; border-radius: 4px; font-size: 0.7rem; font-weight: 700; margin-right: 4px; margin-bottom: 4px; text-transform: uppercase; color: white; }
-    
-    .stTextInput input, .stMultiSelect div[data-baseweb="select"] { background-color: var(--input-bg) !important; border: 1px solid var(--card-border) !important; color: var(--text-primary) !important; border-radius: 8px; }
-    .stExpander { border: 1px solid var(--card-border) !important; border-radius: 8px !important; background-color: var(--card-bg) !important; }
-    .streamlit-expanderHeader { background-color: transparent !important; color: var(--text-primary) !important; font-weight: 700 !important; }
-    </style>
-""", unsafe_allow_html=True)
+# titan/static/titan.css, leído una vez por proceso
+st.markdown(estilos(), unsafe_allow_html=True)
 
 # ==============================================================================
 # 3. SEGURIDAD
 # ==============================================================================
 def check_password():
+    # Dos formas de entrar (secrets.toml):
+    #   password = "..."          clave compartida del equipo, sin identidad
+    #   [usuarios]                opcional, una clave por persona: con ella se entra como
+    #   ana = "..."               "ana" y hay seguimientos, novedades y alertas propios
     if "password_correct" not in st.session_state: st.session_state["password_correct"] = False
+    usuarios = st.secrets.get("usuarios", {})
     def password_entered():
-        if st.session_state["password"] == st.secrets["password"]:
-            st.session_state["password_correct"] = True; del st.session_state["password"]
-        else: st.session_state["password_correct"] = False
+        nombre, clave = st.session_state.get("login_usuario", "").strip(), st.session_state["password"]
+        if nombre: ok = nombre in usuarios and hmac.compare_digest(clave, str(usuarios[nombre]))
+        else: ok = "password" in st.secrets and hmac.compare_digest(clave, str(st.secrets["password"]))
+        st.session_state["password_correct"] = ok
+        if ok:
+            st.session_state["usuario"] = nombre or None
+            del st.session_state["password"]
     if not st.session_state["password_correct"]:
         st.markdown("<h1 style='text-align:center;'>🔒 ACCESO RESTRINGIDO</h1>", unsafe_allow_html=True)
         c1, c2, c3 = st.columns([1,1,1])
-        with c2: st.text_input("CLAVE DE ACCESO", type="password", on_change=password_entered, key="password")
+        with c2:
+            if usuarios: st.text_input("USUARIO", placeholder="Vacío para la clave del equipo", key="login_usuario")
+            st.text_input("CLAVE DE ACCESO", type="password", on_change=password_entered, key="password")
         return False
     return True
 
 # ==============================================================================
-# 4. LÓGICA Y HERRAMIENTAS
+# 4. LÓGICA Y HERRAMIENTAS (cachés de proceso sobre el paquete titan)
 # ==============================================================================
-@st.cache_data(ttl=600)
-def load_data():
-    try:
-        sid = st.secrets["sheet_id"]
-        url = f"https://docs.google.com/spreadsheets/d/{sid}/export?format=csv"
-        r = requests.get(url, timeout=10)
-        df = pd.read_csv(io.StringIO(r.content.decode('utf-8')))
-        df.columns = [str(c).strip() for c in df.columns]
-        df = df.dropna(subset=[df.columns[1]]) 
-        return df
-    except Exception as e: return None
-
-def investigar_con_ia(titulo, link_boe):
-    try:
-        tavily = TavilyClient(api_key=st.secrets["tavily_key"])
-        client = Groq(api_key=st.secrets["groq_key"])
-        search_query = f"requisitos beneficiarios exclusiones bases reguladoras {titulo} oficial"
-        busqueda = tavily.search(query=search_query, search_depth="basic", max_results=3)
-        contexto = "\n".join([f"Fuente: {r['url']}\nContenido: {r['content']}" for r in busqueda['results']])
-        prompt = f"""Eres un Consultor Senior. Analiza: {titulo} ({link_boe})
-        CONTEXTO: {contexto}
-        IMPORTANTE: NO USES FORMATO MARKDOWN. NO USES '###', NI '**', NI '####'.
-        Escribe en texto plano, usando guiones para listas.
-        Responde con 3 bloques:
-        1. REQUISITOS TÉCNICOS OCULTOS
-        2. EXCLUSIONES CLAVE
-        3. ESTRATEGIA PARA GANAR
-        """
-        chat = client.chat.completions.create(model="llama-3.3-70b-versatile", messages=[{"role": "user", "content": prompt}])
-        return chat.choices[0].message.content
-    except Exception as e: return f"Error en la investigación: {str(e)}"
-
-def clean_format(text):
-    if not isinstance(text, str): return str(text)
-    text = re.sub(r'#{1,6}\s?', '', text) 
-    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text) 
-    text = re.sub(r'\*(.*?)\*', r'\1', text) 
-    replacements = {'—': '-', '–': '-', '“': '"', '”': '"', '’': "'", '‘': "'", '€': 'EUR', '•': '-', '…': '...', '🔍': '->', '⚠️': '(!)', '💡': '(IDEA)', '✅': '(SI)'}
-    for k, v in replacements.items(): text = text.replace(k, v)
-    return text.encode('latin-1', 'replace').decode('latin-1')
-
-class PDFReport(FPDF):
-    def header(self):
-        if os.path.exists(LOGO_FILE):
-            try: self.image(LOGO_FILE, x=10, y=8, w=40) 
-            except: pass
-        self.set_font('Arial', 'B', 10)
-        self.set_text_color(100, 100, 100)
-        self.cell(0, 10, 'TITAN X | INFORME DE ESTRATEGIA', 0, 1, 'R')
-        self.ln(15)
-    def footer(self):
-        self.set_y(-15)
-        self.set_font('Arial', 'I', 8)
-        self.set_text_color(150, 150, 150)
-        self.cell(0, 10, f'Pagina {self.page_no()}', 0, 0, 'C')
-
-def generar_pdf(titulo, resumen, requisitos, investigacion):
-    pdf = PDFReport()
-    pdf.add_page()
-    pdf.set_auto_page_break(auto=True, margin=15)
-    pdf.set_font("Arial", 'B', 16)
-    pdf.set_text_color(15, 23, 42)
-    pdf.multi_cell(0, 8, clean_format(titulo.upper()), align='L')
-    pdf.ln(5)
-    pdf.set_draw_color(6, 182, 212)
-    pdf.set_line_width(0.5)
-    pdf.line(10, pdf.get_y(), 200, pdf.get_y())
-    pdf.ln(8)
-    sections = [("RESUMEN EJECUTIVO", resumen), ("REQUISITOS OFICIALES", requisitos), ("AUDITORIA ESTRATEGICA (IA)", investigacion)]
-    for title, content in sections:
-        pdf.set_font("Arial", 'B', 12)
-        pdf.set_fill_color(241, 245, 249)
-        pdf.set_text_color(0, 0, 0)
-        pdf.cell(0, 8, clean_format(title), ln=True, fill=True)
-        pdf.ln(2)
-        pdf.set_font("Arial", '', 10)
-        pdf.set_text_color(50, 50, 50)
-        pdf.multi_cell(0, 6, clean_format(content))
-        pdf.ln(5)
-    return pdf.output(dest='S').encode('latin-1')
-
-def get_tag_bg(tag):
-    t = tag.lower()
-    if "next" in t: return "background: linear-gradient(90deg, #2563eb, #1d4ed8);"
-    if "subvenc" in t: return "background: linear-gradient(90deg, #059669, #047857);"
-    if "prestamo" in t: return "background: linear-gradient(90deg, #d97706, #b45309);"
-    if "bonif" in t: return "background: linear-gradient(90deg, #7c3aed, #6d28d9);"
-    return "background: #475569;"
-
-def get_img_url(sector, titulo):
-    text_content = (str(sector) + " " + str(titulo)).lower()
-    replacements = (("á", "a"), ("é", "e"), ("í", "i"), ("ó", "o"), ("ú", "u"), ("ü", "u"), ("ñ", "n"))
-    for a, b in replacements:
-        text_content = text_content.replace(a, b)
-    base_params = "?auto=format&fit=crop&w=800&q=80"
-    
-    if any(x in text_content for x in ['dana', 'catastrofe', 'emergencia', 'inundaci']): 
-        return f"https://images.unsplash.com/photo-1639164631388-857f29935861{base_params}"
-    if any(x in text_content for x in ['eolic', 'viento', 'aerogenerador', 'wind']): 
-        return f"https://images.unsplash.com/photo-1548337138-e87d889cc369{base_params}"
-    if any(x in text_content for x in ['solar', 'fotov', 'placas']): 
-        return f"https://images.unsplash.com/photo-1756913454593-ac5cab482a7a{base_params}"
-    if any(x in text_content for x in ['moves', 'coche', 'vehiculo', 'puntos de recarga', 'automocion']): 
-        return f"https://images.unsplash.com/photo-1596731498067-99aeb581d3d7{base_params}"
-    if any(x in text_content for x in ['salud', 'sanitar', 'farma', 'medic', 'hospital', 'cancer']): 
-        return f"https://images.unsplash.com/photo-1532938911079-1b06ac7ceec7{base_params}"
-    if any(x in text_content for x in ['indust', 'manufac', 'fabrica', 'maquina', 'cadena de valor']): 
-        return f"https://images.unsplash.com/photo-1581091226825-a6a2a5aee158{base_params}"
-    if any(x in text_content for x in ['educa', 'formaci', 'universidad', 'beca', 'lector', 'curso', 'fp', 'profesional']): 
-        return f"https://images.unsplash.com/photo-1524178232363-1fb2b075b655{base_params}"
-    if any(x in text_content for x in ['digital', 'ia ', 'softw', 'tic', 'cyber', 'ciber']): 
-        return f"https://images.unsplash.com/photo-1580894894513-541e068a3e2b{base_params}"
-    if any(x in text_content for x in ['agro', 'campo', 'forest', 'ganad', 'rural']): 
-        return f"https://images.unsplash.com/photo-1625246333195-78d9c38ad449{base_params}"
-    if any(x in text_content for x in ['turis', 'hotel', 'viaje', 'hostel']):
-        return f"https://images.unsplash.com/photo-1551882547-ff40c63fe5fa{base_params}"
-    if any(x in text_content for x in ['construc', 'vivienda', 'rehab', 'edific']):
-        return f"https://images.unsplash.com/photo-1503387762-592deb58ef4e{base_params}"
-    if any(x in text_content for x in ['maritimo', 'naval', 'barco', 'puerto', 'portuari', 'mercancia', 'transporte']): 
-        return f"https://images.unsplash.com/photo-1606185540834-d6e7483ee1a4{base_params}"
-    if any(x in text_content for x in ['hidro', 'repotencia', 'central', 'presa', 'agua']): 
-        return f"https://images.unsplash.com/photo-1642915064502-f9cfb135f347{base_params}"
-    if any(x in text_content for x in ['startup', 'emprende', 'idi', 'innovacion', 'tecnologic', 'investig']): 
-        return f"https://images.unsplash.com/photo-1519389950473-47ba0277781c{base_params}"
-    if any(x in text_content for x in ['cultur', 'patrimonio', 'historic', 'archivo', 'museo', 'arte']): 
-        return f"https://images.unsplash.com/photo-1765984990058-2f4a880bf9af{base_params}"
-    if any(x in text_content for x in ['paviment', 'calle', 'obra', 'asfalt', 'urbaniz']): 
-        return f"https://images.unsplash.com/photo-1762438441472-be21c5148e8a{base_params}"
-    if any(x in text_content for x in ['gas', 'combustible', 'hidrogeno', 'renovable', 'biogas']): 
-        return f"https://images.unsplash.com/photo-1654334036171-e01e52b2ce8e{base_params}"
-    if any(x in text_content for x in ['asesora', 'consultor', 'transformacion', 'kit digital']): 
-        return f"https://images.unsplash.com/photo-1454165804606-c3d57bc86b40{base_params}"
-    if any(x in text_content for x in ['joven', 'juvenil', 'estudiante', 'egresado', 'asociaci', 'federacion']): 
-        return f"https://images.unsplash.com/photo-1523240795612-9a054b0db644{base_params}"
-    return f"https://images.unsplash.com/photo-1497215728101-856f4ea42174{base_params}"
+@st.cache_resource
+def get_clients():
+    return build_clients(st.secrets)
+
+@st.cache_resource
+def get_refresher(background=True):
+    # En la app, el hilo del refresher deja listos los derivados de cada versión antes de publicarla
+    return DatasetRefresher(st.secrets["sheet_id"], get_clients(), int(st.secrets.get("refresh_interval", REFRESH_INTERVAL)), background,
+                            preparar_version if background else None)
+
+def load_data(sincrono=False):
+    # UI: nunca bloquea salvo en el arranque en frío sin snapshot en disco.
+    # CLI (sincrono): descarga la versión actual antes de usarla; el snapshot queda como fallback.
+    with metricas.span("load_data"):
+        try: refresher = get_refresher(background=not sincrono)
+        except Exception as e: return {"df": None, "meta": {}, "version": None, "refreshed_at": None, "error": str(e), "stale": False, "changes": None}
+        if sincrono: refresher.refresh()
+        elif refresher.state["df"] is None: refresher.ready.wait(timeout=15)
+        return refresher.state
+
+@st.cache_resource
+def get_row_cache():
+    return RowCache()
+
+@metricas.cacheada("indice_busqueda", st.cache_resource(max_entries=2))
+def get_search_index(version, _df):
+    # Un índice por versión del dataset; _df no se hashea (lo identifica version)
+    return SearchIndex(_df, get_row_cache().search_postings(_df))
+
+@metricas.cacheada("motor_filtros", st.cache_resource(max_entries=2))
+def get_filter_engine(version, _df):
+    return FilterEngine(_df)
+
+@metricas.cacheada("presentacion", st.cache_resource(max_entries=2))
+def get_presentation(version, _df):
+    return presentacion(_df, get_row_cache())
+
+@metricas.cacheada("indice_encaje", st.cache_resource(max_entries=2))
+def get_match_index(version, _df):
+    # TF-IDF de título/análisis/requisitos; RowCache solo tokeniza las filas nuevas o modificadas
+    return MatchIndex(_df, get_row_cache().match_postings(_df))
+
+@metricas.cacheada("ranking_perfil", st.cache_resource(max_entries=16))
+def get_ranking_perfil(version, sector, tamano, region, descripcion, _df):
+    # -> (posiciones por encaje, encaje de todas las filas) para un perfil de empresa
+    perfil = {"sector": list(sector), "tamano": tamano, "region": region, "descripcion": descripcion}
+    return puntuar_perfil(get_match_index(version, _df), get_filter_engine(version, _df), perfil)
+
+def preparar_version(df, version):
+    # Mismas cachés que usan los reruns: el primer usuario de la versión ya las encuentra hechas
+    get_filter_engine(version, df)
+    get_presentation(version, df)
+    get_search_index(version, df)
+    get_match_index(version, df)
+
+def aplicar_filtros(df, version, query="", beneficiario=(), sector=(), prob=(), desde=None):
+    return filtrar(df, get_filter_engine(version, df), get_search_index(version, df) if query else None, query,
+                   {"beneficiario": beneficiario, "sector": sector, "probabilidad": prob}, desde)
+
+@metricas.cacheada("agregados", st.cache_data(max_entries=128, show_spinner=False))
+def get_agregados(version, firma, _df, _positions):
+    # Memoizado por firma de filtros (version + selección)
+    return agregados(get_filter_engine(version, _df), get_presentation(version, _df), _df, _positions)
+
+@metricas.cacheada("figuras", st.cache_resource(max_entries=32))
+def get_figuras(version, firma, _agg):
+    # Figuras del panel por firma de filtros; solo se piden con el panel abierto
+    return figuras_analitica(_agg)
+
+@st.cache_resource
+def get_user_store():
+    return UserStore()
+
+@st.cache_resource
+def get_alertas():
+    # Seguimientos de todos los usuarios ordenados por plazo; se sincroniza con cada versión
+    return MotorAlertas(get_user_store())
+
+@st.cache_resource(max_entries=2)
+def get_link_positions(version, _df):
+    # enlace BOE -> posición de fila (la última si se repite); solo para la vista de seguimientos
+    return dict(zip(_df["link"].astype(str), range(len(_df))))
+
+def current_user():
+    # Usuario con el que se entró (tabla [usuarios] de secrets, ver check_password). Con la clave
+    # del equipo -> None: no hay seguimientos, porque un nombre compartido o tomado de la URL
+    # mezclaría el estado de varias personas.
+    return st.session_state.get("usuario")
+
+@st.cache_resource
+def get_research_store():
+    return ResearchStore(ttl_days=int(st.secrets.get("research_ttl_days", RESEARCH_TTL_DAYS)))
+
+@st.cache_resource
+def get_preanalisis_job():
+    return PreanalisisJob()
+
+def exportar_informes(df, positions, formato="zip", workers=EXPORT_WORKERS):
+    # Para el botón de descarga (data diferida): igual que exportar_tabla, temporal y bytes al final
+    from titan.informes import EXPORT_FORMATS, tareas_informes
+    with tempfile.TemporaryFile() as destino:
+        EXPORT_FORMATS[formato](tareas_informes(df, positions, get_research_store()), destino, workers)
+        destino.seek(0)
+        return destino.read()
+
+def exportar_tabla(df, positions, formato, con_ia=False, con_urgencia=False):
+    # Solo al pulsar el botón (data diferida). Se escribe por bloques a un temporal y se devuelven
+    # los bytes: Streamlit guarda la descarga en memoria igualmente y no acepta ficheros de lectura/escritura
+    with tempfile.TemporaryFile() as destino:
+        exportar_datos(df, positions, formato, destino, get_research_store() if con_ia else None, datetime.now() if con_urgencia else None)
+        destino.seek(0)
+        return destino.read()
+
+@metricas.cacheada("informe_pdf", st.cache_data(max_entries=64, show_spinner=False))
+def informe_pdf(titulo, resumen, requisitos, investigacion):
+    # Cacheado por hash de las entradas: el mismo contenido no se vuelve a maquetar
+    from titan.informes import generar_pdf
+    return generar_pdf(titulo, resumen, requisitos, investigacion)
     
+# ==============================================================================
+# 4B. MODO HEADLESS (python app.py preanalisis ...)
+# ==============================================================================
+def cli(argv):
+    parser = argparse.ArgumentParser(prog="app.py", description="Radar Titan en modo headless")
+    sub = parser.add_subparsers(dest="cmd", required=True)
+    p = sub.add_parser("preanalisis", help="Auditoría IA masiva de convocatorias")
+    p.add_argument("--prob", help='Solo esta probabilidad de éxito (ej. "Alta")')
+    p.add_argument("--dias", type=int, help="Solo las que cierran en los próximos N días")
+    p.add_argument("--todas", action="store_true", help="Reanaliza aunque ya exista auditoría en caché")
+    p.add_argument("--workers", type=int, default=PREANALISIS_WORKERS)
+    p.add_argument("--perfil", help="Actividad de la empresa: solo las de mejor encaje con el perfil")
+    p.add_argument("--perfil-sector", action="append", default=[], help="Sector del perfil (repetible)")
+    p.add_argument("--tamano", help='Tipo de beneficiario del perfil (ej. "PYME")')
+    p.add_argument("--region", help="Región del perfil")
+    p.add_argument("--top", type=int, default=20, help="Con perfil: cuántas de las de mejor encaje")
+    p = sub.add_parser("exportar", help="Informes PDF o tabla de datos de las convocatorias que pasan los filtros")
+    p.add_argument("salida", help="Fichero de salida (.zip, .pdf, .csv, .parquet, .xlsx o .jsonl)")
+    p.add_argument("--formato", choices=EXPORT_PDF_FORMATS + EXPORT_DATA_FORMATS, help="Por defecto, según la extensión de salida")
+    p.add_argument("--ia", action="store_true", help="Datos: añade la auditoría IA en caché")
+    p.add_argument("--urgencia", action="store_true", help="Datos: añade urgencia y días restantes")
+    p.add_argument("--query", default="", help="Búsqueda textual")
+    p.add_argument("--beneficiario", action="append", default=[])
+    p.add_argument("--sector", action="append", default=[])
+    p.add_argument("--prob", action="append", default=[])
+    p.add_argument("--workers", type=int, default=EXPORT_WORKERS)
+    p = sub.add_parser("resumen", help="Resumen de seguimientos por usuario (para programarlo con cron)")
+    p.add_argument("--usuario", action="append", help="Por defecto, todos los que siguen alguna convocatoria")
+    p.add_argument("--dias", type=int, default=ALERTA_DIAS)
+    p.add_argument("-o", "--salida", help="Fichero Markdown (por defecto, stdout)")
+    args = parser.parse_args(argv)
+    configurar_log()
+    data = load_data(sincrono=True)
+    if data["df"] is None:
+        print(f"DATABASE ERROR: {data['error']}")
+        return 1
+    if data["error"]: print(f"⚠️ Hoja no disponible ({data['error']}): se usa el snapshot local")
+    if args.cmd == "resumen":
+        alertas = get_alertas()
+        alertas.sincronizar(data["df"], data["version"], data.get("changes"))
+        texto = "\n".join(alertas.resumen(u, datetime.now(), args.dias) for u in args.usuario or alertas.usuarios())
+        if not args.salida: print(texto)
+        else:
+            with open(args.salida, "w", encoding='utf-8') as f: f.write(texto)
+        return 0
+    store = get_research_store()
+    if args.cmd == "exportar":
+        df = data["df"]
+        hits = aplicar_filtros(df, data["version"], args.query, args.beneficiario, args.sector, args.prob)
+        positions = hits if hits is not None else np.arange(len(df))
+        extension = os.path.splitext(args.salida)[1].lstrip(".").lower()
+        formato = args.formato or (extension if extension in EXPORT_PDF_FORMATS + EXPORT_DATA_FORMATS else "zip")
+        if formato in EXPORT_DATA_FORMATS:
+            exportar_datos(df, positions, formato, args.salida, store if args.ia else None, datetime.now() if args.urgencia else None)
+            print(f"{len(positions)} filas -> {args.salida}")
+            return 0
+        if formato == "pdf" and len(positions) > EXPORT_PDF_UNICO_MAX:
+            print(f"El PDF único admite como máximo {EXPORT_PDF_UNICO_MAX} informes ({len(positions)} seleccionados): usa .zip o afina los filtros")
+            return 2
+        print(f"{len(positions)} informes -> {args.salida}")
+        from titan.informes import EXPORT_FORMATS, tareas_informes
+        # fork: proceso de un solo uso y sin sesiones; forkserver volvería a ejecutar app.py en cada hijo
+        EXPORT_FORMATS[formato](tareas_informes(df, positions, store), args.salida, args.workers,
+                                on_progress=lambda i: print(f"\r{i}/{len(positions)}", end="", flush=True), arranque="fork")
+        print()
+        return 0
+    perfil = {"sector": args.perfil_sector, "tamano": args.tamano, "region": args.region or "", "descripcion": args.perfil or ""}
+    mejores = None
+    if not perfil_vacio(perfil):
+        mejores = get_ranking_perfil(data["version"], tuple(perfil["sector"]), perfil["tamano"], perfil["region"], perfil["descripcion"], data["df"])[0][:args.top]
+    items = seleccionar_para_preanalisis(data["df"], store, solo_nuevas=not args.todas, prob=args.prob, dias=args.dias, positions=mejores)
+    print(f"{len(items)} convocatorias a analizar")
+    resumen = preanalizar(items, store, get_clients(), args.workers, on_progress=lambda i, n, t, e: print(f"[{i}/{n}] {'ERROR' if e else 'OK'} {t}" + (f" -> {e}" if e else "")))
+    print(f"Completadas: {resumen['ok']} · Errores: {resumen['errores']}")
+    return 2 if resumen["errores"] else 0
+
+CLI_COMMANDS = ("preanalisis", "exportar", "resumen")
+if not st.runtime.exists() and len(sys.argv) > 1 and sys.argv[1] in CLI_COMMANDS:
+    sys.exit(cli(sys.argv[1:]))
+
 # ==============================================================================
 # 5. UI PRINCIPAL
 # ==============================================================================
+# Traza de este rerun para el panel de rendimiento; log JSON con st.secrets["metrics_log"] o TITAN_METRICS_LOG
+metricas.iniciar_traza()
+configurar_log(st.secrets.get("metrics_log"))
 if check_password():
-    df = load_data()
+    data = load_data()
+    df = data["df"]
     if df is not None:
         
         # --- SIDEBAR ---
         with st.sidebar:
-            if os.path.exists(LOGO_FILE): st.image(LOGO_FILE, use_container_width=True)
+            if logo_bytes(): st.image(logo_bytes(), use_container_width=True)
             st.markdown("### 🎛️ FILTROS")
             st.markdown("---")
             
             query = st.text_input("Búsqueda Textual", placeholder="Ej: Digitalización...", key="search_bar")
             
             # --- LÓGICA DE CASCADA ---
-            beneficiarios_list = sorted(df.iloc[:, 10].dropna().astype(str).unique())
+            engine = get_filter_engine(data["version"], df)
+            beneficiarios_list = engine.options("beneficiario")
             sel_beneficiario = st.multiselect("1. Tipo de Beneficiario", beneficiarios_list)
             
-            df_cascade = df.copy()
-            if sel_beneficiario:
-                df_cascade = df_cascade[df_cascade.iloc[:, 10].astype(str).isin(sel_beneficiario)]
-            
-            sectores_disponibles = sorted(df_cascade.iloc[:, 5].dropna().astype(str).unique())
+            sectores_disponibles = engine.options("sector", {"beneficiario": sel_beneficiario})
             sel_sector = st.multiselect("2. Sector Estratégico", sectores_disponibles)
             
-            probs_unicas = sorted(df.iloc[:, 9].astype(str).unique())
+            probs_unicas = engine.options("probabilidad")
             sel_prob = st.multiselect("Probabilidad de Éxito", probs_unicas)
             
-            # Aplicación final de filtros
-            filtered_df = df.copy()
-            if query: 
-                filtered_df = filtered_df[filtered_df.apply(lambda r: r.astype(str).str.contains(query, case=False).any(), axis=1)]
-            if sel_beneficiario: 
-                filtered_df = filtered_df[filtered_df.iloc[:, 10].astype(str).isin(sel_beneficiario)]
-            if sel_sector: 
-                filtered_df = filtered_df[filtered_df.iloc[:, 5].astype(str).isin(sel_sector)]
-            if sel_prob: 
-                filtered_df = filtered_df[filtered_df.iloc[:, 9].astype(str).isin(sel_prob)]
+            # Novedades: filas nuevas o modificadas desde la visita anterior de este usuario (la de
+            # la sesión anterior con el mismo usuario; con la clave del equipo no hay visita que comparar)
+            usuario = current_user()
+            if "last_visit" not in st.session_state:
+                st.session_state["last_visit"] = get_user_store().touch_visit(usuario) if usuario else None
+            last_visit = st.session_state["last_visit"]
+            n_novedades = int((df["updated_at"] > last_visit).sum()) if last_visit else 0
+            solo_novedades = st.toggle(f"🆕 Novedades desde tu última visita ({n_novedades})", key="solo_novedades", disabled=not n_novedades,
+                                       help=None if usuario else "Entra con tu usuario para ver las novedades desde tu última visita") and n_novedades > 0
+            
+            # Seguimientos: el motor se pone al día con la versión publicada (no-op si no ha cambiado)
+            alertas = get_alertas()
+            alertas.sincronizar(df, data["version"], data.get("changes"))
+            seguidas = alertas.ordenados(usuario, datetime.now()) if usuario else []
+            solo_seguidas = st.toggle(f"⭐ Mis seguimientos ({len(seguidas)})", key="solo_seguidas", disabled=not seguidas,
+                                      help=None if usuario else "Entra con tu usuario para seguir convocatorias") and bool(seguidas)
+            if seguidas:
+                st.download_button("📄 Resumen de seguimientos", data=partial(alertas.resumen, usuario, datetime.now()), file_name="seguimientos.md",
+                                   mime="text/markdown", use_container_width=True)
+            
+            # Encaje con un perfil de empresa: similitud TF-IDF + coincidencia de sector y tamaño
+            with st.expander("🎯 ENCAJE CON PERFIL DE EMPRESA"):
+                perfil = {"sector": st.multiselect("Sector de la empresa", engine.options("sector"), key="perfil_sector"),
+                          "tamano": st.selectbox("Tamaño / tipo", engine.options("beneficiario"), index=None, placeholder="Cualquiera", key="perfil_tamano"),
+                          "region": st.text_input("Región", placeholder="Ej: Galicia", key="perfil_region").strip(),
+                          "descripcion": st.text_area("Actividad y proyectos", placeholder="Ej: instalamos placas solares en naves industriales...", key="perfil_desc").strip()}
+                modo_perfil = st.toggle("Ordenar por encaje", key="modo_perfil", disabled=perfil_vacio(perfil)) and not perfil_vacio(perfil)
+            clave_perfil = (tuple(perfil["sector"]), perfil["tamano"], perfil["region"], perfil["descripcion"]) if modo_perfil else None
+            if modo_perfil: ranking, encaje = get_ranking_perfil(data["version"], *clave_perfil, df)
+            
+            # Aplicación final de filtros (posiciones de fila; la búsqueda marca el orden)
+            desde = last_visit if solo_novedades else None
+            firma = (query, tuple(sel_beneficiario), tuple(sel_sector), tuple(sel_prob), desde, tuple(seguidas) if solo_seguidas else None, clave_perfil)
+            hits = aplicar_filtros(df, data["version"], query, sel_beneficiario, sel_sector, sel_prob, desde)
+            if solo_seguidas:
+                # En orden de cierre; el resto de filtros sigue aplicando
+                link_pos = get_link_positions(data["version"], df)
+                seg_pos = np.array([link_pos[l] for l in seguidas if l in link_pos], dtype=np.int64)
+                hits = seg_pos if hits is None else seg_pos[np.isin(seg_pos, hits)]
+            if modo_perfil:
+                # De más a menos encaje; el resto de filtros sigue aplicando
+                hits = ranking if hits is None else ranking[np.isin(ranking, hits)]
+            # La sesión solo guarda posiciones; el dataset es único y compartido
+            positions = hits if hits is not None else np.arange(len(df))
             
             st.markdown("---")
             st.markdown("### 📥 EXPORTAR")
-            csv = filtered_df.to_csv(index=False).encode('utf-8')
-            st.download_button("Descargar CSV", data=csv, file_name="titan_export.csv", mime="text/csv", use_container_width=True)
+            # Datos: se generan al pulsar (data diferida), nunca en cada rerun
+            formato_datos = st.radio("Datos", EXPORT_DATA_FORMATS, format_func=str.upper, horizontal=True, key="export_fmt")
+            c_ia, c_urg = st.columns(2)
+            con_ia = c_ia.checkbox("Auditoría IA", key="export_ia")
+            con_urgencia = c_urg.checkbox("Urgencia", key="export_urgencia")
+            st.download_button(f"Descargar {formato_datos.upper()}", data=partial(exportar_tabla, df, positions, formato_datos, con_ia, con_urgencia),
+                               file_name=f"titan_export.{formato_datos}", mime=EXPORT_MIME[formato_datos], use_container_width=True)
+            # El PDF único se monta entero en memoria: solo para selecciones acotadas
+            formatos_pdf = EXPORT_PDF_FORMATS if len(positions) <= EXPORT_PDF_UNICO_MAX else ("zip",)
+            formato_pdf = st.radio("Informes PDF", formatos_pdf, format_func=lambda f: "ZIP (uno por convocatoria)" if f == "zip" else "PDF único", horizontal=True, key="export_pdf_fmt")
+            if len(formatos_pdf) < len(EXPORT_PDF_FORMATS): st.caption(f"PDF único hasta {EXPORT_PDF_UNICO_MAX} convocatorias: filtra más o descarga el ZIP.")
+            st.download_button(f"📦 {len(positions)} INFORMES PDF", data=partial(exportar_informes, df, positions, formato_pdf),
+                               file_name=f"informes_titan.{formato_pdf}", mime="application/zip" if formato_pdf == "zip" else "application/pdf",
+                               disabled=len(positions) == 0, use_container_width=True)
+
+            if st.secrets.get("admin_password"):
+                st.markdown("---")
+                with st.expander("🤖 PRE-ANÁLISIS IA"):
+                    if st.text_input("Clave admin", type="password", key="admin_key") == st.secrets["admin_password"]:
+                        job = get_preanalisis_job()
+                        modos = ["Todas sin auditar", "Alta probabilidad y cierre próximo"] + (["Mejor encaje con el perfil"] if modo_perfil else [])
+                        modo = st.radio("Selección", modos, key="pre_modo")
+                        dias = st.number_input("Cierran en (días)", min_value=1, max_value=365, value=30, key="pre_dias") if modo == "Alta probabilidad y cierre próximo" else None
+                        top = st.number_input("Las N de mejor encaje", min_value=1, max_value=500, value=20, key="pre_top") if modo == "Mejor encaje con el perfil" else None
+                        store = get_research_store()
+                        items = seleccionar_para_preanalisis(df, store, prob="Alta" if dias else None, dias=dias, positions=ranking[:top] if top else None)
+                        st.caption(f"{len(items)} convocatorias pendientes de auditar")
+                        js = job.state
+                        if js["running"]:
+                            st.progress(js["done"] / max(js["total"], 1), text=f"{js['done']}/{js['total']} · {js['errores']} errores")
+                            st.button("↻ Actualizar progreso", use_container_width=True)
+                        elif st.button("▶️ LANZAR PRE-ANÁLISIS", disabled=not items, use_container_width=True):
+                            job.start(items, store, get_clients())
+                            st.rerun()
+                        if js["finished_at"]: st.caption(f"Último lote {js['finished_at']:%H:%M}: {js['ok']} OK · {js['errores']} errores")
+                        if js["last_error"]: st.caption(f"⚠️ {js['last_error']}")
+
+            st.markdown("---")
+            refresher = get_refresher()
+            refreshed = data["refreshed_at"].strftime("%H:%M:%S") if data["refreshed_at"] else "snapshot local"
+            st.caption(f"🛰️ Datos: {refreshed} · refresco cada {refresher.interval // 60} min")
+            cambios = data.get("changes")
+            if cambios: st.caption(f"🔁 Cambios {cambios['at']:%H:%M}: +{len(cambios['added'])} nuevas · {len(cambios['changed'])} modificadas · {len(cambios['removed'])} retiradas")
+            if data["error"]: st.caption(f"⚠️ Último error: {data['error']}")
+            if st.button("🔄 REFRESCAR AHORA", use_container_width=True): refresher.trigger()
 
         # --- HERO ---
         c_hero1, c_hero2 = st.columns([3, 1])
@@ -413,32 +400,34 @@ if check_password():
             st.markdown("<p style='font-size:1.1rem; margin-top:-10px;'>Detección inteligente de fondos públicos.</p>", unsafe_allow_html=True)
         st.markdown("<div style='height:20px'></div>", unsafe_allow_html=True)
 
+        # --- ALERTAS DE SEGUIMIENTO ---
+        urgentes = alertas.proximas(usuario, datetime.now(), ALERTA_DIAS) if usuario else []
+        if urgentes:
+            st.warning(f"⏰ {len(urgentes)} convocatoria(s) que sigues cierran en los próximos {ALERTA_DIAS} días: "
+                       + " · ".join(f"{alertas.titulo(l)[:60]} ({p:%d/%m})" for l, p in urgentes[:3]) + (" …" if len(urgentes) > 3 else ""))
+
         # --- KPIs ---
         kpi1, kpi2, kpi3, kpi4 = st.columns(4)
-        total_ops = len(filtered_df)
-        high_prob = len(filtered_df[filtered_df.iloc[:, 9].astype(str).str.contains("Alta", case=False)])
+        agg = get_agregados(data["version"], firma, df, positions)
+        total_ops = agg["total"]
+        high_prob = agg["alta"]
         ratio = round((high_prob / total_ops * 100), 1) if total_ops > 0 else 0
         kpi1.metric("OPORTUNIDADES", total_ops, delta="Activas")
         kpi2.metric("ALTA PROBABILIDAD", high_prob, delta="Prioritarias", delta_color="normal")
         kpi3.metric("RATIO DE ÉXITO", f"{ratio}%")
-        kpi4.metric("ACTUALIZACIÓN", "En Vivo")
+        kpi4.metric("ACTUALIZACIÓN", "Snapshot" if data["stale"] else "En Vivo")
 
         # --- GRÁFICOS ---
-        with st.expander("📊 ANALÍTICA DE MERCADO", expanded=False):
-            if total_ops > 0:
+        # on_change="rerun" hace que el expander sepa si está abierto: cerrado no se construye nada
+        with st.expander("📊 ANALÍTICA DE MERCADO", expanded=False, key="panel_analitica", on_change="rerun") as panel:
+            if panel.open and total_ops > 0:
+                fig1, fig2, fig3, fig4 = get_figuras(data["version"], firma, agg)
                 g1, g2 = st.columns(2)
-                with g1:
-                    sector_counts = filtered_df.iloc[:, 5].value_counts().reset_index()
-                    sector_counts.columns = ['Sector', 'Count']
-                    fig1 = px.pie(sector_counts, values='Count', names='Sector', hole=0.6, color_discrete_sequence=px.colors.sequential.Bluyl)
-                    fig1.update_layout(title_text="Distribución por Sector", height=350, margin=dict(l=20, r=20, t=40, b=20), paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)", showlegend=False)
-                    st.plotly_chart(fig1, use_container_width=True)
-                with g2:
-                    prob_counts = filtered_df.iloc[:, 9].value_counts().reset_index()
-                    prob_counts.columns = ['Probabilidad', 'Count']
-                    fig2 = px.bar(prob_counts, x='Probabilidad', y='Count', color='Probabilidad', color_discrete_sequence=px.colors.qualitative.Bold)
-                    fig2.update_layout(title_text="Análisis de Probabilidad", height=350, margin=dict(l=20, r=20, t=40, b=20), paper_bgcolor="rgba(0,0,0,0)", showlegend=False)
-                    st.plotly_chart(fig2, use_container_width=True)
+                g1.plotly_chart(fig1, use_container_width=True)
+                g2.plotly_chart(fig2, use_container_width=True)
+                g3, g4 = st.columns(2)
+                g3.plotly_chart(fig3, use_container_width=True)
+                g4.plotly_chart(fig4, use_container_width=True)
 
         st.markdown("---")
 
@@ -446,47 +435,54 @@ if check_password():
         if total_ops == 0:
             st.info("⚠️ No hay resultados que coincidan con tus filtros.")
         else:
+            c_sort, c_size, c_mode, c_page = st.columns([2, 1, 1, 1])
+            sort_label = c_sort.selectbox("Ordenar por", list(SORT_OPTIONS), key="grid_sort")
+            page_size = c_size.selectbox("Tarjetas por página", PAGE_SIZES, index=1, key="grid_page_size")
+            load_more = c_mode.toggle("Cargar más", key="grid_load_more")
+            
+            # Cualquier cambio de filtros u orden vuelve a la primera página
+            grid_sig = (*firma, sort_label, page_size, data["version"])
+            if st.session_state.get("grid_sig") != grid_sig:
+                st.session_state["grid_sig"] = grid_sig
+                st.session_state["grid_page"] = 1
+                st.session_state["grid_visible"] = page_size
+            
+            if SORT_OPTIONS[sort_label] == "deadline":
+                # Depende de hoy: no cabe en el modelo por versión
+                positions = positions[orden_plazo(get_presentation(data["version"], df)["deadline"].to_numpy()[positions], datetime.now())]
+            elif SORT_OPTIONS[sort_label]:
+                keys = get_presentation(data["version"], df)[SORT_OPTIONS[sort_label]].to_numpy()[positions]
+                positions = positions[np.argsort(keys, kind='stable')]
+            
+            # Solo se renderiza el tramo visible: la carga por rerun no depende del total
+            n_pages = -(-total_ops // page_size)
+            if load_more:
+                start, end = 0, min(st.session_state["grid_visible"], total_ops)
+            else:
+                page = c_page.number_input("Página", min_value=1, max_value=n_pages, key="grid_page")
+                start, end = (page - 1) * page_size, min(page * page_size, total_ops)
+            st.caption(f"Mostrando {start + 1}-{end} de {total_ops} oportunidades")
+            page_df = df.iloc[positions[start:end]]
+            
             cols = st.columns(2)
-            today = datetime.now()
+            research_store = get_research_store()
+            vista = get_presentation(data["version"], df).iloc[positions[start:end]]
+            # --- LÓGICA DE ALERTA Y FECHAS (COLUMNA E): lo único que depende de hoy ---
+            urgency_labels, urgency_classes, plazo_styles = urgencia(vista["deadline"].to_numpy(), datetime.now())
             
-            for i, (index, row) in enumerate(filtered_df.iterrows()):
-                titulo = row.iloc[1]
-                sector = row.iloc[5]
-                tags_raw = str(row.iloc[2]).split('|')
-                tags_html = "".join([f"<span class='titan-tag' style='{get_tag_bg(t.strip())}'>{t.strip()}</span>" for t in tags_raw if t.strip()])
-                cuantia = row.iloc[3]
-                plazo_raw = str(row.iloc[4])
-                probabilidad = str(row.iloc[9]).strip().upper()
-                analisis_ia = row.iloc[6]
-                requisitos_txt = row.iloc[8]
-                link_boe = str(row.iloc[0])
-                img_url = get_img_url(sector, titulo)
-                
-                # --- LÓGICA DE ALERTA Y FECHAS (COLUMNA E) ---
-                urgency_label = ""
-                urgency_class = ""
-                plazo_style = ""
-                
-                try:
-                    deadline_dt = datetime.strptime(plazo_raw, "%d/%m/%Y")
-                    delta_days = (deadline_dt - today).days
-                    
-                    if delta_days < 0:
-                        urgency_label = "🚫 FUERA DE PLAZO"
-                        urgency_class = "border-color: #64748b;" 
-                        plazo_style = "color: #94a3b8; text-decoration: line-through;"
-                    elif delta_days <= 7:
-                        urgency_label = "🚨 CIERRE INMINENTE"
-                        urgency_class = "blink-urgent" 
-                        plazo_style = "color: var(--urgent-red); font-weight: 900;"
-                    else:
-                        urgency_label = f"⌛ FALTAN {delta_days} DÍAS"
-                        urgency_class = "" 
-                except:
-                    urgency_label = "ℹ️ CONVOCATORIA ABIERTA"
-                    urgency_class = ""
-
-                badge_border = "rgba(16, 185, 129, 0.5)" if "ALTA" in probabilidad else ("rgba(245, 158, 11, 0.5)" if "MEDIA" in probabilidad else "rgba(148, 163, 184, 0.5)")
+            t_tarjetas = time.perf_counter()
+            for i, (index, row) in enumerate(page_df.iterrows()):
+                titulo = row["title"]
+                tags_html = vista["tags_html"].iat[i]
+                cuantia = row["amount"]
+                plazo_raw = str(row["deadline"])
+                probabilidad = vista["probabilidad"].iat[i]
+                analisis_ia = row["analysis"]
+                requisitos_txt = row["requirements"]
+                link_boe = str(row["link"])
+                img_url = vista["img_url"].iat[i]
+                urgency_label, urgency_class, plazo_style = urgency_labels[i], urgency_classes[i], plazo_styles[i]
+                badge_border = vista["badge_border"].iat[i]
                 
                 # HTML DE LA TARJETA MEJORADO
                 card_html = f"""
@@ -514,20 +510,28 @@ if check_password():
                 """
                 with cols[i % 2]:
                     st.markdown(card_html, unsafe_allow_html=True)
+                    if modo_perfil: st.caption(f"🎯 Encaje con el perfil: {encaje[positions[start + i]]:.0%}")
                     
                     with st.expander("🔬 INVESTIGACIÓN PROFUNDA & PDF"):
-                        key_investigacion = f"investigacion_{index}"
+                        # Por contenido de la fila (incluye título y enlace), no por etiqueta: tras un
+                        # refresco la etiqueta puede ser otra convocatoria y una fila cambiada pide auditoría nueva
+                        key_investigacion = f"investigacion_{row['row_hash']}"
+                        if key_investigacion not in st.session_state:
+                            # Auditoría ya pagada por otra sesión: se recupera de la caché compartida
+                            cached = research_store.get(titulo, link_boe, row["row_hash"])
+                            if cached: st.session_state[key_investigacion] = cached["result"]
                         if key_investigacion not in st.session_state:
                             st.info("💡 Pulsa para analizar las Bases Oficiales en tiempo real.")
                             if st.button("🔍 BUSCAR BASES REALES", key=f"ai_btn_{index}", use_container_width=True):
                                 with st.spinner("⏳ TITAN AI leyendo el BOE..."):
-                                    res_profundo = investigar_con_ia(titulo, link_boe)
+                                    res_profundo = st.write_stream(investigar_stream(titulo, link_boe, row["row_hash"], research_store, get_clients()))
                                     st.session_state[key_investigacion] = res_profundo
                                     st.rerun() 
                         else:
                             st.success("✅ Auditoría Completada")
                             st.markdown(f"<div style='font-size:0.9rem; color:#475569'>{st.session_state[key_investigacion]}</div>", unsafe_allow_html=True)
-                            pdf_data = generar_pdf(titulo, analisis_ia, requisitos_txt, st.session_state[key_investigacion])
+                            # El PDF se genera solo al pulsar el botón (data diferida)
+                            pdf_data = partial(informe_pdf, titulo, analisis_ia, requisitos_txt, st.session_state[key_investigacion])
                             st.download_button(label="📥 DESCARGAR INFORME PDF OFICIAL", data=pdf_data, file_name=f"Informe_Titan_{index}.pdf", mime="application/pdf", use_container_width=True, key=f"pdf_btn_{index}")
 
                     with st.expander("🔻 ANÁLISIS PREVIO", expanded=False):
@@ -540,6 +544,34 @@ if check_password():
                         st.caption(str(requisitos_txt)[:300] + "...") 
                         c_btn1, c_btn2 = st.columns([1,1])
                         with c_btn1: st.link_button("📄 VER BOE", link_boe, use_container_width=True)
-                        with c_btn2: st.button("⭐ SEGUIR", key=f"fav_{index}", use_container_width=True)
+                        with c_btn2:
+                            siguiendo = alertas.sigue(usuario, link_boe)
+                            st.button("★ SIGUIENDO" if siguiendo else "⭐ SEGUIR", key=f"fav_{index}", use_container_width=True, type="primary" if siguiendo else "secondary",
+                                      disabled=usuario is None, help=None if usuario else "Entra con tu usuario para seguir convocatorias",
+                                      on_click=partial(alertas.dejar, usuario, link_boe) if siguiendo else partial(alertas.seguir, usuario, link_boe, titulo, row["deadline_date"]))
                     st.markdown("<div style='height:20px'></div>", unsafe_allow_html=True)
+            metricas.registrar("ui.tarjetas", time.perf_counter() - t_tarjetas, {"tarjetas": end - start})
+            
+            if load_more and end < total_ops:
+                st.button(f"⬇️ CARGAR {min(page_size, total_ops - end)} MÁS", use_container_width=True,
+                          on_click=lambda: st.session_state.update(grid_visible=end + page_size))
     else: st.error("DATABASE ERROR")
+
+    # --- RENDIMIENTO (debug): desglose de este rerun y percentiles de la ventana móvil ---
+    traza = metricas.traza()
+    metricas.registrar("ui.rerun", time.perf_counter() - traza["inicio"])
+    if st.secrets.get("debug_password"):
+        with st.sidebar:
+            st.markdown("---")
+            with st.expander("⏱️ RENDIMIENTO"):
+                if st.text_input("Clave debug", type="password", key="debug_key") == st.secrets["debug_password"]:
+                    st.caption("Este rerun (ms)")
+                    st.dataframe([{"span": n, "ms": round(s * 1000, 2), "detalle": ", ".join(f"{k}={v}" for k, v in a.items())} for n, s, a in traza["spans"]],
+                                 hide_index=True, use_container_width=True)
+                    st.caption(f"Percentiles (últimas {VENTANA_METRICAS} muestras por span, ms)")
+                    st.dataframe([{"span": k, "n": v["n"], **{q: round(v[q], 2) for q in ("p50", "p90", "p99")}} for k, v in metricas.percentiles().items()],
+                                 hide_index=True, use_container_width=True)
+                    st.caption("Cachés (este rerun · proceso)")
+                    st.dataframe([{"caché": k, "hit": traza["caches"][k]["hit"], "miss": traza["caches"][k]["miss"], "hit total": v["hit"], "miss total": v["miss"],
+                                   "ratio": f"{v['hit'] / max(v['hit'] + v['miss'], 1):.0%}"} for k, v in metricas.resumen_caches().items()],
+                                 hide_index=True, use_container_width=True)
@@ -0,0 +1,210 @@
+import io
+import os
+import sys
+import json
+import time
+import shutil
+import argparse
+import platform
+import tempfile
+import tracemalloc
+import subprocess
+from statistics import median
+from functools import partial
+import numpy as np
+import pandas as pd
+try: import resource
+except ImportError: resource = None  # Windows
+
+RAIZ = os.path.dirname(os.path.dirname(os.path.abspath(__file__)))
+sys.path.insert(0, RAIZ)
+from benchmarks.sintetico import generar_csv
+from titan.config import LOGO_FILE
+from titan.clientes import StubClients
+from titan.datos import parse_sheet, fetch_sheet, track_changes
+from titan.busqueda import SearchIndex, FilterEngine, RowCache, filtrar
+from titan.perfil import MatchIndex, puntuar_perfil
+from titan.presentacion import presentacion, urgencia, agregados, get_img_url
+from titan.investigacion import _investigar
+from titan.informes import clean_format, generar_pdf
+from titan.exportacion import exportar_datos
+
+# ==============================================================================
+# BENCHMARKS (offline: hoja sintética + backend stub, sin Streamlit)
+# ==============================================================================
+# python benchmarks/bench.py --json base.json            # medir
+# python benchmarks/bench.py --compare base.json         # medir y comparar (exit 1 si hay regresión)
+SIZES = [1_000, 10_000, 100_000]
+HOY = "2026-06-01"  # fecha fija: plazos y urgencias iguales entre ejecuciones
+SEED = 0
+QUERIES = ["digital", "energia solar", "ayudas pymes", "rehabilitacion edificios galicia", "hidrogeno", "startups innovacion", "zzz"]
+SELECCIONES = [{"beneficiario": ["PYME"]}, {"sector": ["Turismo", "Salud"], "probabilidad": ["Alta"]},
+               {"beneficiario": ["Autónomo", "PYME"], "sector": ["Digitalización"]}]
+PERFILES = [{"sector": ["Energía Solar"], "tamano": "PYME", "region": "Galicia", "descripcion": "Instalamos placas fotovoltaicas y autoconsumo en naves industriales"},
+            {"sector": [], "tamano": None, "region": "", "descripcion": "startup de software de gestión con inteligencia artificial y ciberseguridad"}]
+PAGE_SIZE = 20
+PDF_SAMPLE = 20
+CAMBIOS = 0.01  # fracción de filas modificadas entre versiones para los casos incrementales
+
+def medir(preparar, repeat):
+    # preparar() -> función a cronometrar; lo que prepara (cachés, copias) queda fuera de la medida.
+    # -> (tiempos de cada repetición, pico de memoria Python en MB de una ejecución aparte)
+    tiempos = []
+    for _ in range(repeat):
+        fn = preparar()
+        t = time.perf_counter()
+        fn()
+        tiempos.append(time.perf_counter() - t)
+    fn = preparar()
+    tracemalloc.start()
+    fn()
+    pico = tracemalloc.get_traced_memory()[1] / 2**20
+    tracemalloc.stop()
+    return tiempos, pico
+
+def modificar(csv, fraccion, seed=SEED):
+    # Siguiente versión de la hoja: un % de títulos reescritos (mismas filas y enlaces)
+    hoja = pd.read_csv(io.BytesIO(csv))
+    idx = np.random.default_rng(seed + 1).choice(len(hoja), max(1, int(len(hoja) * fraccion)), replace=False)
+    hoja.iloc[idx, 1] = hoja.iloc[idx, 1] + " (modificada)"
+    return hoja.to_csv(index=False).encode('utf-8')
+
+def fijo(fn):
+    return lambda: fn
+
+def casos(n, tmp):
+    # -> [(nombre, unidades procesadas, preparar)] para una hoja de n filas
+    csv = generar_csv(n, SEED, HOY)
+    csv_path = os.path.join(tmp, f"hoja_{n}.csv")
+    with open(csv_path, "wb") as f: f.write(csv)
+    clients = StubClients(csv_path)
+    df, _ = track_changes(None, parse_sheet(csv))
+    siguiente = parse_sheet(modificar(csv, CAMBIOS))
+    df2, _ = track_changes(df, siguiente.copy())
+    engine, index, encaje = FilterEngine(df), SearchIndex(df), MatchIndex(df)
+    vista = presentacion(df)
+    positions = np.arange(n)
+    hoy = np.datetime64(HOY)
+    def buscar():
+        index._term_scores.cache_clear()
+        for q in QUERIES: index.search(q)
+    def filtrar_todo():
+        engine._facet_counts.cache_clear()
+        for sel in SELECCIONES:
+            filtrar(df, engine, selections=sel)
+            engine.options("sector", sel)
+    def indice_incremental():
+        # caché caliente con la versión anterior; se mide el índice de la siguiente
+        rc = RowCache()
+        rc.search_postings(df)
+        return lambda: SearchIndex(df2, rc.search_postings(df2))
+    def encaje_incremental():
+        rc = RowCache()
+        rc.match_postings(df)
+        return lambda: MatchIndex(df2, rc.match_postings(df2))
+    def modelo_incremental():
+        rc = RowCache()
+        presentacion(df, rc)
+        return partial(presentacion, df2, rc)
+    def pagina():
+        vista_pag = vista.iloc[positions[:PAGE_SIZE]]
+        urgencia(vista_pag["deadline"].to_numpy(), hoy)
+        df.iloc[positions[:PAGE_SIZE]].to_dict("records")
+    return [
+        ("parse_csv", n, fijo(lambda: parse_sheet(csv))),
+        ("fetch_stub", n, fijo(lambda: fetch_sheet("bench", clients))),
+        ("diff_versiones", n, lambda: partial(track_changes, df, siguiente.copy())),
+        ("filtros_build", n, fijo(lambda: FilterEngine(df))),
+        ("filtros", n * len(SELECCIONES), fijo(filtrar_todo)),
+        ("busqueda_build", n, fijo(lambda: SearchIndex(df))),
+        ("busqueda_build_incremental", n, indice_incremental),
+        ("busqueda", n * len(QUERIES), fijo(buscar)),
+        ("encaje_build", n, fijo(lambda: MatchIndex(df))),
+        ("encaje_build_incremental", n, encaje_incremental),
+        ("encaje_perfil", n * len(PERFILES), fijo(lambda: [puntuar_perfil(encaje, engine, p) for p in PERFILES])),
+        ("tarjetas_modelo", n, fijo(lambda: presentacion(df))),
+        ("tarjetas_modelo_incremental", n, modelo_incremental),
+        ("tarjetas_pagina", PAGE_SIZE, fijo(pagina)),
+        ("agregados", n, fijo(lambda: agregados(engine, vista, df, positions))),
+        ("get_img_url", n, fijo(lambda: [get_img_url(s, t) for s, t in zip(df["sector"].astype(str), df["title"].astype(str))])),
+        ("exportar_csv", n, fijo(lambda: exportar_datos(df, positions, "csv", io.BytesIO(), hoy=hoy))),
+        ("exportar_parquet", n, fijo(lambda: exportar_datos(df, positions, "parquet", io.BytesIO(), hoy=hoy))),
+        ("clean_format", n, fijo(lambda: [clean_format(t) for t in df["analysis"].astype(str)])),
+    ]
+
+def casos_fijos(tmp):
+    # Independientes del tamaño de la hoja: se miden una vez sobre una muestra
+    df = parse_sheet(generar_csv(PDF_SAMPLE, SEED, HOY))
+    clients = StubClients()
+    filas = list(zip(df["title"].astype(str), df["analysis"].astype(str), df["requirements"].astype(str), df["link"].astype(str)))
+    # Calentamiento: el primer PDF del proceso decodifica el logo (una vez, ver load_logo)
+    generar_pdf(*filas[0][:3], StubClients.STUB_ANALYSIS)
+    return [
+        ("generar_pdf", PDF_SAMPLE, fijo(lambda: [generar_pdf(t, a, r, StubClients.STUB_ANALYSIS) for t, a, r, _ in filas])),
+        ("investigacion_stub", PDF_SAMPLE, fijo(lambda: [_investigar(t, l, clients) for t, _, _, l in filas])),
+    ]
+
+def ejecutar(nombre, filas, unidades, preparar, repeat):
+    tiempos, pico = medir(preparar, repeat)
+    r = {"caso": nombre, "filas": filas, "unidades": unidades, "repeticiones": repeat, "min_s": min(tiempos), "mediana_s": median(tiempos),
+         "throughput": unidades / min(tiempos) if min(tiempos) > 0 else float("inf"), "pico_mb": round(pico, 2)}
+    print(f"{nombre:<30}{filas:>9}{r['min_s'] * 1000:>12.2f}{r['mediana_s'] * 1000:>12.2f}{r['throughput']:>14,.0f}{r['pico_mb']:>10.1f}", flush=True)
+    return r
+
+def commit_actual():
+    try: return subprocess.run(["git", "-C", RAIZ, "rev-parse", "--short", "HEAD"], capture_output=True, text=True, check=True).stdout.strip()
+    except Exception: return None
+
+def comparar(resultados, base, tolerancia, umbral_ms):
+    # Regresión = min_s por encima de la base más la tolerancia relativa (mismo caso y tamaño)
+    # y al menos umbral_ms más lento: por debajo de eso manda el ruido del reloj
+    previos = {(r["caso"], r["filas"]): r for r in base["resultados"]}
+    regresiones = []
+    print(f"\nComparación con {base['meta'].get('commit')} (tolerancia {tolerancia:.0%})")
+    for r in resultados:
+        b = previos.get((r["caso"], r["filas"]))
+        if not b: continue
+        delta = r["min_s"] / b["min_s"] - 1 if b["min_s"] > 0 else 0.0
+        marca = "REGRESIÓN" if delta > tolerancia and (r["min_s"] - b["min_s"]) * 1000 > umbral_ms else ""
+        print(f"{r['caso']:<30}{r['filas']:>9}{b['min_s'] * 1000:>12.2f}{r['min_s'] * 1000:>12.2f}{delta:>+10.1%}  {marca}")
+        if marca: regresiones.append(r)
+    return regresiones
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Benchmarks de Radar Titan (offline)")
+    parser.add_argument("--sizes", type=int, nargs="+", default=SIZES, help="Filas de las hojas sintéticas")
+    parser.add_argument("--repeat", type=int, default=3)
+    parser.add_argument("--solo", nargs="+", help="Solo los casos con estos nombres")
+    parser.add_argument("--json", help="Guarda los resultados en este fichero")
+    parser.add_argument("--compare", help="JSON de una ejecución anterior con la que comparar")
+    parser.add_argument("--tolerancia", type=float, default=0.25, help="Regresión relativa admitida en --compare")
+    parser.add_argument("--umbral-ms", type=float, default=5.0, help="Diferencia absoluta mínima para contar como regresión")
+    args = parser.parse_args(argv)
+    logo = os.path.join(RAIZ, LOGO_FILE)
+    resultados = []
+    print(f"{'caso':<30}{'filas':>9}{'min ms':>12}{'mediana ms':>12}{'unid/s':>14}{'pico MB':>10}")
+    with tempfile.TemporaryDirectory() as tmp:
+        # Snapshots y cachés van al temporal; el logo se copia para que los PDF sean los reales
+        cwd = os.getcwd()
+        os.chdir(tmp)
+        if os.path.exists(logo): shutil.copy(logo, LOGO_FILE)
+        try:
+            for n in args.sizes:
+                for nombre, unidades, fn in casos(n, tmp):
+                    if not args.solo or nombre in args.solo: resultados.append(ejecutar(nombre, n, unidades, fn, args.repeat))
+            for nombre, unidades, fn in casos_fijos(tmp):
+                if not args.solo or nombre in args.solo: resultados.append(ejecutar(nombre, unidades, unidades, fn, args.repeat))
+        finally: os.chdir(cwd)
+    meta = {"commit": commit_actual(), "fecha": time.strftime("%Y-%m-%dT%H:%M:%S"), "python": platform.python_version(),
+            "plataforma": platform.platform(), "cpus": os.cpu_count(), "seed": SEED, "hoy": HOY, "repeat": args.repeat,
+            "max_rss_mb": round(resource.getrusage(resource.RUSAGE_SELF).ru_maxrss / 1024, 1) if resource else None}
+    print(f"\nPico de memoria del proceso: {meta['max_rss_mb']} MB")
+    if args.json:
+        with open(args.json, "w", encoding='utf-8') as f: json.dump({"meta": meta, "resultados": resultados}, f, indent=2, ensure_ascii=False)
+    if args.compare:
+        with open(args.compare, encoding='utf-8') as f: base = json.load(f)
+        if comparar(resultados, base, args.tolerancia, args.umbral_ms): return 1
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
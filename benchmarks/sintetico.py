@@ -0,0 +1,94 @@
+import os
+import sys
+import argparse
+import numpy as np
+import pandas as pd
+
+# ==============================================================================
+# HOJA SINTÉTICA DE CONVOCATORIAS (mismo formato de 11 columnas que la hoja real)
+# ==============================================================================
+COLUMNAS = ["Enlace BOE", "Título", "Etiquetas", "Cuantía", "Plazo", "Sector", "Análisis IA", "Organismo", "Requisitos", "Probabilidad", "Beneficiario"]
+SECTORES = ["Industria", "Digitalización", "Energía Solar", "Energía Eólica", "Turismo", "Agroalimentario", "Salud", "Educación",
+            "Construcción", "Movilidad Sostenible", "Cultura", "I+D+i", "Transporte Marítimo", "Hidrógeno Verde", "Emprendimiento"]
+TEMAS = {
+    "Industria": ["modernización de líneas de fabricación", "maquinaria industrial avanzada", "cadena de valor del automóvil"],
+    "Digitalización": ["transformación digital de pymes", "ciberseguridad", "software de gestión e IA aplicada"],
+    "Energía Solar": ["autoconsumo fotovoltaico", "placas solares en cubiertas", "almacenamiento energético"],
+    "Energía Eólica": ["repotenciación de parques eólicos", "aerogeneradores marinos"],
+    "Turismo": ["modernización hotelera", "turismo rural sostenible", "destinos turísticos inteligentes"],
+    "Agroalimentario": ["regadío eficiente", "industria agroalimentaria", "relevo generacional en el campo"],
+    "Salud": ["equipamiento hospitalario", "investigación farmacéutica", "salud digital"],
+    "Educación": ["formación profesional dual", "becas universitarias", "cursos de capacitación digital"],
+    "Construcción": ["rehabilitación energética de edificios", "vivienda asequible", "urbanización de polígonos"],
+    "Movilidad Sostenible": ["programa MOVES III", "puntos de recarga", "flotas de vehículos eléctricos"],
+    "Cultura": ["conservación del patrimonio histórico", "museos y archivos", "industrias culturales"],
+    "I+D+i": ["proyectos de investigación industrial", "startups de base tecnológica", "innovación en pymes"],
+    "Transporte Marítimo": ["digitalización portuaria", "renovación de flota naval", "transporte de mercancías"],
+    "Hidrógeno Verde": ["electrolizadores", "biogás y combustibles renovables"],
+    "Emprendimiento": ["jóvenes emprendedores", "consolidación de startups", "asesoramiento empresarial"],
+}
+ACCIONES = ["Ayudas para", "Subvenciones destinadas a", "Convocatoria de ayudas para", "Línea de financiación para", "Programa de apoyo a"]
+AMBITOS = ["en Andalucía", "en Castilla y León", "en la Comunitat Valenciana", "en Galicia", "en Cataluña", "en la Región de Murcia",
+           "en Aragón", "en Canarias", "a nivel estatal", "en municipios de menos de 5.000 habitantes"]
+ETIQUETAS = ["Subvención", "Next Generation", "Préstamo", "Bonificación", "FEDER", "Concurrencia Competitiva", "PERTE", "Fondo Perdido"]
+ORGANISMOS = ["Ministerio de Industria y Turismo", "Ministerio para la Transformación Digital", "IDAE", "CDTI", "Red.es", "Junta de Andalucía", "Xunta de Galicia"]
+PROBABILIDADES = (["Alta", "Media", "Baja", "Alta (encaje total)", "Media - revisar requisitos"], [0.3, 0.35, 0.25, 0.05, 0.05])
+BENEFICIARIOS = ["PYME", "Autónomo", "Gran Empresa", "Ayuntamiento", "Entidad sin ánimo de lucro", "Universidad", "Comunidad de Regantes"]
+ANALISIS = ("**Resumen:** la convocatoria financia {tema} con una intensidad de ayuda de hasta el {pct}% del coste subvencionable. "
+            "Encaja con empresas del sector {sector} que acrediten viabilidad técnica y económica.\n"
+            "### Puntos clave\n- Presupuesto mínimo del proyecto: {minimo} €\n- Compatible con otras ayudas hasta el límite de minimis\n"
+            "- Justificación mediante cuenta justificativa con informe de auditor — plazo de 3 meses")
+REQUISITOS = "Estar al corriente con Hacienda y Seguridad Social; domicilio fiscal {ambito}; no estar en crisis; plantilla mínima de {plantilla} empleados."
+
+def importes(rng, n):
+    # "1.250.000,00 €" (formato español) con un 5 % de cuantías sin determinar
+    euros = np.round(np.exp(rng.uniform(np.log(5_000), np.log(20_000_000), n)), -3)
+    texto = [f"{e:,.2f} €".replace(",", "_").replace(".", ",").replace("_", ".") for e in euros]
+    return np.where(rng.random(n) < 0.05, "Sin determinar", texto)
+
+def plazos(rng, n, hoy=None):
+    # dd/mm/YYYY entre hace 60 días y dentro de 300; un 8 % sin fecha ("Abierta")
+    hoy = pd.Timestamp(hoy or pd.Timestamp.now().normalize())
+    fechas = (hoy + pd.to_timedelta(rng.integers(-60, 300, n), unit="D")).strftime("%d/%m/%Y")
+    return np.where(rng.random(n) < 0.08, "Abierta", fechas)
+
+def generar_hoja(n, seed=0, hoy=None):
+    # -> DataFrame con las 11 columnas de la hoja, determinista para (n, seed, hoy)
+    rng = np.random.default_rng(seed)
+    sectores = rng.choice(SECTORES, n)
+    temas = [TEMAS[s][k % len(TEMAS[s])] for s, k in zip(sectores, rng.integers(0, 3, n))]
+    ambitos = rng.choice(AMBITOS, n)
+    acciones = rng.choice(ACCIONES, n)
+    # 1-3 etiquetas distintas por fila: las k primeras de una permutación aleatoria
+    orden = np.argsort(rng.random((n, len(ETIQUETAS))), axis=1)
+    tags = ["|".join(ETIQUETAS[j] for j in fila[:k]) for fila, k in zip(orden, rng.integers(1, 4, n))]
+    pct, minimo, plantilla = rng.choice([30, 40, 50, 65, 80, 100], n), rng.integers(10, 500, n) * 1000, rng.integers(1, 50, n)
+    return pd.DataFrame({
+        "Enlace BOE": [f"https://www.boe.es/diario_boe/txt.php?id=BOE-B-2026-{100000 + i}" for i in range(n)],
+        "Título": [f"{a} {t} {amb} ({i})" for i, (a, t, amb) in enumerate(zip(acciones, temas, ambitos))],
+        "Etiquetas": tags,
+        "Cuantía": importes(rng, n),
+        "Plazo": plazos(rng, n, hoy),
+        "Sector": sectores,
+        "Análisis IA": [ANALISIS.format(tema=t, pct=p, sector=s, minimo=f"{m:,}".replace(",", ".")) for t, p, s, m in zip(temas, pct, sectores, minimo)],
+        "Organismo": rng.choice(ORGANISMOS, n),
+        "Requisitos": [REQUISITOS.format(ambito=a, plantilla=p) for a, p in zip(ambitos, plantilla)],
+        "Probabilidad": rng.choice(PROBABILIDADES[0], n, p=PROBABILIDADES[1]),
+        "Beneficiario": rng.choice(BENEFICIARIOS, n),
+    }, columns=COLUMNAS)
+
+def generar_csv(n, seed=0, hoy=None):
+    return generar_hoja(n, seed, hoy).to_csv(index=False).encode('utf-8')
+
+if __name__ == "__main__":
+    # CSV para el backend stub: TITAN_BACKEND=stub TITAN_STUB_CSV=hoja.csv streamlit run app.py
+    parser = argparse.ArgumentParser(description="Genera una hoja sintética de convocatorias")
+    parser.add_argument("filas", type=int)
+    parser.add_argument("-o", "--salida", default="-", help="Fichero CSV (por defecto, stdout)")
+    parser.add_argument("--seed", type=int, default=0)
+    args = parser.parse_args()
+    contenido = generar_csv(args.filas, args.seed)
+    if args.salida == "-": sys.stdout.buffer.write(contenido)
+    else:
+        os.makedirs(os.path.dirname(os.path.abspath(args.salida)), exist_ok=True)
+        with open(args.salida, "wb") as f: f.write(contenido)
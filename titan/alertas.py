@@ -0,0 +1,118 @@
+import threading
+import pandas as pd
+from bisect import bisect_left, insort
+from collections import defaultdict
+from titan.config import ALERTA_DIAS
+
+# ==============================================================================
+# SEGUIMIENTOS Y ALERTAS POR PLAZO
+# ==============================================================================
+SIN_PLAZO = 2**62  # "Abierta": detrás de cualquier fecha
+RETIRADA = 2**63 - 1  # ya no está en la hoja: al final de todo
+
+def clave_plazo(plazo):
+    return SIN_PLAZO if pd.isna(plazo) else pd.Timestamp(plazo).value
+
+class MotorAlertas:
+    # Convocatorias seguidas de cada usuario en una lista ordenada por plazo: "qué cierra antes" y
+    # "qué cierra en N días" son búsquedas binarias, sin recorrer el dataset. Una versión nueva de
+    # la hoja solo recoloca los enlaces seguidos que marca el diff de track_changes.
+    def __init__(self, store):
+        self.store = store
+        self.lock = threading.Lock()
+        self.version = None
+        self.orden = defaultdict(list)  # user -> [(clave_plazo, link)] ordenada
+        self.seguidores = defaultdict(set)  # link -> {user}
+        self.plazos = {}  # link -> clave_plazo
+        self.titulos = {}  # link -> título (el de la hoja al sincronizar)
+        # Sin versión todavía: la primera sincronización coloca cada enlace en su plazo real
+        for user, link, titulo in store.watchlists(): self._alta(user, link, titulo, RETIRADA)
+
+    def _alta(self, user, link, titulo, clave):
+        if user in self.seguidores[link]: return
+        self.seguidores[link].add(user)
+        self.plazos.setdefault(link, clave)
+        self.titulos.setdefault(link, titulo)
+        insort(self.orden[user], (self.plazos[link], link))
+
+    def _mover(self, link, clave):
+        # Recoloca el enlace en la lista de cada usuario que lo sigue
+        anterior = self.plazos[link]
+        if anterior == clave: return
+        for user in self.seguidores[link]:
+            lista = self.orden[user]
+            del lista[bisect_left(lista, (anterior, link))]
+            insort(lista, (clave, link))
+        self.plazos[link] = clave
+
+    def seguir(self, user, link, titulo, plazo):
+        self.store.follow(user, link, titulo)
+        with self.lock: self._alta(user, link, titulo, clave_plazo(plazo))
+
+    def dejar(self, user, link):
+        self.store.unfollow(user, link)
+        with self.lock:
+            if user not in self.seguidores.get(link, ()): return
+            lista = self.orden[user]
+            del lista[bisect_left(lista, (self.plazos[link], link))]
+            self.seguidores[link].discard(user)
+            if not self.seguidores[link]: del self.seguidores[link], self.plazos[link], self.titulos[link]
+
+    def sincronizar(self, df, version, cambios=None):
+        # No-op si la versión no ha cambiado. Con un diff calculado desde nuestra versión solo se
+        # miran los enlaces seguidos que toca; si no (arranque, versiones perdidas), todos los seguidos.
+        with self.lock:
+            if version == self.version: return
+            if self.version is not None and cambios and cambios.get("desde") == self.version:
+                tocados = set(self.plazos).intersection(cambios["added"] + cambios["changed"] + cambios["removed"])
+            else: tocados = set(self.plazos)
+            if tocados:
+                filas = df.loc[df["link"].isin(list(tocados)), ["link", "title", "deadline_date"]].drop_duplicates("link", keep="last")
+                plazos = dict(zip(filas["link"], filas["deadline_date"]))
+                self.titulos.update(zip(filas["link"], filas["title"]))
+                for link in tocados: self._mover(link, clave_plazo(plazos[link]) if link in plazos else RETIRADA)
+            self.version = version
+
+    # --- Consultas ---
+    def sigue(self, user, link):
+        return user in self.seguidores.get(link, ())
+
+    def usuarios(self):
+        with self.lock: return [u for u, lista in self.orden.items() if lista]
+
+    def titulo(self, link):
+        return self.titulos.get(link, link)
+
+    def proximas(self, user, desde, dias=None):
+        # -> [(link, plazo)] que cierran en [desde, desde + dias) (sin límite si dias es None), por fecha
+        inicio = pd.Timestamp(desde)
+        with self.lock:
+            lista = self.orden.get(user, [])
+            i = bisect_left(lista, (inicio.value,))
+            j = bisect_left(lista, ((inicio + pd.Timedelta(days=dias)).value if dias is not None else SIN_PLAZO,))
+            return [(link, pd.Timestamp(clave)) for clave, link in lista[i:j]]
+
+    def ordenados(self, user, desde):
+        # Vista "Mis seguimientos": lo abierto por fecha de cierre, luego sin plazo, retiradas y lo ya cerrado
+        with self.lock:
+            lista = self.orden.get(user, [])
+            i = bisect_left(lista, (pd.Timestamp(desde).value,))
+            return [link for _, link in lista[i:] + lista[:i]]
+
+    def resumen(self, user, desde, dias=ALERTA_DIAS):
+        # Resumen en Markdown (descarga desde la UI o `python app.py resumen` programado con cron)
+        desde = pd.Timestamp(desde)
+        with self.lock: claves = list(self.orden.get(user, []))
+        pronto, despues = self.proximas(user, desde, dias), self.proximas(user, desde + pd.Timedelta(days=dias))
+        sin_plazo = [link for clave, link in claves if clave == SIN_PLAZO]
+        retiradas = [link for clave, link in claves if clave == RETIRADA]
+        cerradas = [(link, pd.Timestamp(clave)) for clave, link in claves[:bisect_left(claves, (desde.value,))]]
+        lineas = [f"# Seguimientos de {user} · {desde:%d/%m/%Y %H:%M}", "",
+                  f"## Cierran en los próximos {dias} días ({len(pronto)})"]
+        lineas += [f"- {plazo:%d/%m/%Y} · {self.titulo(link)} — {link}" for link, plazo in pronto] or ["- Ninguna"]
+        lineas += ["", f"## Próximos cierres ({len(despues)})"]
+        lineas += [f"- {plazo:%d/%m/%Y} · {self.titulo(link)} — {link}" for link, plazo in despues] or ["- Ninguna"]
+        if sin_plazo: lineas += ["", f"## Sin plazo ({len(sin_plazo)})"] + [f"- {self.titulo(link)} — {link}" for link in sin_plazo]
+        if cerradas: lineas += ["", f"## Ya cerradas ({len(cerradas)})"] + [f"- {plazo:%d/%m/%Y} · {self.titulo(link)} — {link}" for link, plazo in cerradas]
+        if retiradas: lineas += ["", f"## Retiradas de la hoja ({len(retiradas)})"] + [f"- {self.titulo(link)} — {link}" for link in retiradas]
+        return "\n".join(lineas) + "\n"
@@ -0,0 +1,191 @@
+import re
+import threading
+import unicodedata
+import numpy as np
+import pandas as pd
+from bisect import bisect_left
+from functools import lru_cache
+from titan.metricas import metricas
+from titan.config import SEARCH_FIELDS, MATCH_FIELDS, FACET_COLUMNS, STEM_LEN
+
+# ==============================================================================
+# BÚSQUEDA Y FILTROS
+# ==============================================================================
+TOKEN_RE = re.compile(r"[a-z0-9]+")
+MIN_PREFIX = 3  # términos más cortos solo casan exactos: "I+D+i" -> "i", "d", no todo el vocabulario
+# Palabras vacías (ya sin acentos) que el índice de encaje descarta
+STOPWORDS = frozenset("""a al ante bajo como con contra de del desde durante e el en entre es esta este hasta la las le lo los mas
+    mediante o otra otro para pero por que se segun sin sobre su sus tras un una uno unos unas y ya""".split())
+
+def fold_text(text):
+    # minúsculas y sin acentos: "Innovación" -> "innovacion"
+    text = unicodedata.normalize('NFKD', str(text).lower())
+    return text.encode('ascii', 'ignore').decode('ascii')
+
+def fold_series(s):
+    return s.astype("string").fillna("").str.lower().str.normalize('NFKD').str.encode('ascii', 'ignore').str.decode('ascii')
+
+def stem_tokens(tokens):
+    # Sin stemmer: raíz por prefijo, sin palabras vacías ni números (importes, fechas)
+    tokens = tokens[~tokens.isin(STOPWORDS) & (tokens.str.len() > 2) & ~tokens.str.isdigit()]
+    return tokens.str[:STEM_LEN]
+
+def tokenize_rows(df, fields=SEARCH_FIELDS, stem=False):
+    # -> postings (row, tok, w) con row = posición en df y w = suma de los pesos de campo
+    parts = []
+    for col, weight in fields.items():
+        if col not in df.columns: continue
+        tokens = fold_series(df[col].reset_index(drop=True)).str.findall(TOKEN_RE).explode().dropna()
+        if stem: tokens = stem_tokens(tokens)
+        parts.append(pd.DataFrame({"row": tokens.index.values, "tok": tokens.values, "w": weight}))
+    if not parts: return pd.DataFrame({"row": pd.Series([], dtype=np.int64), "tok": pd.Series([], dtype=object), "w": pd.Series([], dtype=float)})
+    return pd.concat(parts).groupby(["row", "tok"], as_index=False)["w"].sum()
+
+class SearchIndex:
+    # Índice invertido en formato CSR: el vocabulario está ordenado, así que todos
+    # los tokens que empiezan por un prefijo ocupan un tramo contiguo de postings.
+    def __init__(self, df, row_postings=None):
+        self.n = len(df)
+        row_postings = tokenize_rows(df) if row_postings is None else row_postings
+        postings = row_postings.groupby(["tok", "row"])["w"].sum()
+        if postings.empty: postings.index = pd.MultiIndex.from_arrays([[], []], names=["tok", "row"])
+        vocab, starts = np.unique(np.asarray(postings.index.get_level_values(0), dtype=object), return_index=True)
+        self.vocab = list(vocab)
+        self.offsets = np.append(starts.astype(np.int64), len(postings))
+        self.rows = postings.index.get_level_values(1).to_numpy(dtype=np.int32)
+        # tf ponderado por campo x idf
+        doc_freq = np.diff(self.offsets)
+        idf = np.log1p(self.n / np.maximum(doc_freq, 1))
+        self.scores = postings.to_numpy(dtype=np.float32) * np.repeat(idf, doc_freq).astype(np.float32)
+        self._term_scores = lru_cache(maxsize=256)(self._term_scores)
+
+    def _term_scores(self, term):
+        # -> (filas, puntuación) del término en forma dispersa: la caché ocupa lo que sus postings
+        lo = bisect_left(self.vocab, term)
+        if len(term) >= MIN_PREFIX: hi = bisect_left(self.vocab, term + "\uffff")
+        else: hi = lo + 1 if lo < len(self.vocab) and self.vocab[lo] == term else lo
+        a, b = self.offsets[lo], self.offsets[hi]
+        # Un prefijo abarca varios tokens: se suman los postings de la misma fila
+        filas, inversa = np.unique(self.rows[a:b], return_inverse=True)
+        return filas, np.bincount(inversa, weights=self.scores[a:b], minlength=len(filas))
+
+    def search(self, query):
+        # Devuelve posiciones de fila ordenadas por relevancia (AND de términos; prefijo desde MIN_PREFIX letras)
+        terms = list(dict.fromkeys(TOKEN_RE.findall(fold_text(query))))
+        if not terms: return None
+        total = np.zeros(self.n)
+        cuenta = np.zeros(self.n, dtype=np.int32)
+        for term in terms:
+            filas, sc = self._term_scores(term)
+            total[filas] += sc
+            cuenta[filas] += 1
+        hits = np.flatnonzero(cuenta == len(terms))
+        return hits[np.argsort(-total[hits], kind='stable')]
+
+class RowCache:
+    # Derivados por fila indexados por row_hash y compartidos entre versiones del dataset:
+    # en cada refresco solo se calculan las filas nuevas o modificadas y se podan las retiradas.
+    def __init__(self):
+        self.lock = threading.Lock()
+        self.img = {}
+        vacio = pd.DataFrame({"row_hash": pd.Series([], dtype=object), "tok": pd.Series([], dtype=object), "w": pd.Series([], dtype=float)})
+        self.postings, self.match = vacio, vacio.copy()
+
+    @staticmethod
+    def _pendientes(hashes, conocidos):
+        # Posición de la primera fila de cada row_hash que aún no está en caché
+        pos = {}
+        for i, h in enumerate(hashes):
+            if h not in conocidos and h not in pos: pos[h] = i
+        return np.fromiter(pos.values(), dtype=np.int64, count=len(pos))
+
+    def img_categories(self, df, classify):
+        # classify: texto normalizado -> categoría de imagen (ver presentacion.img_category)
+        hashes = df["row_hash"].to_numpy(dtype=object)
+        with self.lock:
+            nuevas = self._pendientes(hashes, self.img)
+            textos = fold_series(df["sector"].take(nuevas).astype(str) + " " + df["title"].take(nuevas).astype(str))
+            self.img.update(zip(hashes[nuevas], map(classify, textos)))
+            self.img = {h: self.img[h] for h in hashes}
+            return np.fromiter((self.img[h] for h in hashes), dtype=np.int64, count=len(hashes))
+
+    def _row_postings(self, df, attr, **tokenize):
+        # -> postings (row, tok, w) de df, tokenizando solo los row_hash que no estaban en self.<attr>
+        hashes = df["row_hash"].to_numpy(dtype=object)
+        with self.lock:
+            cache = getattr(self, attr)
+            nuevas = self._pendientes(hashes, set(cache["row_hash"].unique()))
+            tokens = tokenize_rows(df.iloc[nuevas], **tokenize)
+            tokens["row"] = hashes[nuevas][tokens["row"].to_numpy(dtype=np.int64)]
+            cache = pd.concat([cache[cache["row_hash"].isin(hashes)], tokens.rename(columns={"row": "row_hash"})], ignore_index=True)
+            setattr(self, attr, cache)
+            filas = pd.DataFrame({"row_hash": hashes, "row": np.arange(len(hashes))})
+            return filas.merge(cache, on="row_hash")[["row", "tok", "w"]]
+
+    def search_postings(self, df):
+        return self._row_postings(df, "postings")
+
+    def match_postings(self, df):
+        # Índice de encaje: título, análisis y requisitos con raíces por prefijo
+        return self._row_postings(df, "match", fields=MATCH_FIELDS, stem=True)
+
+class FilterEngine:
+    # Columnas de filtro codificadas como categóricas una vez por versión, con un
+    # bitmap empaquetado (np.packbits) por valor: filtrar = OR dentro de la columna
+    # y AND entre columnas, sin copias ni astype(str) por rerun.
+    def __init__(self, df):
+        self.n = len(df)
+        self.codes, self.categories, self.bitmaps = {}, {}, {}
+        for name, col in FACET_COLUMNS.items():
+            s = df[col]
+            # probabilidad conserva los vacíos como opción "nan", igual que el listado original
+            # (en pandas 3 astype(str) ya no convierte NA en "nan": se rellena a mano)
+            s = s.astype(str).fillna("nan") if name == "probabilidad" else s
+            cat = pd.Categorical(s)
+            self.codes[name] = cat.codes
+            self.categories[name] = {v: i for i, v in enumerate(cat.categories)}
+            self.bitmaps[name] = [np.packbits(cat.codes == i) for i in range(len(cat.categories))]
+        self._facet_counts = lru_cache(maxsize=128)(self._facet_counts)
+
+    def _packed_mask(self, frozen):
+        mask = None
+        for name, values in frozen:
+            idx = [self.categories[name][v] for v in values if v in self.categories[name]]
+            col = np.bitwise_or.reduce([self.bitmaps[name][i] for i in idx]) if idx else np.zeros((self.n + 7) // 8, dtype=np.uint8)
+            mask = col if mask is None else mask & col
+        return mask
+
+    def _freeze(self, selections):
+        return tuple(sorted((k, tuple(sorted(v))) for k, v in (selections or {}).items() if v))
+
+    def select(self, selections):
+        # Máscara booleana de filas o None si no hay ningún filtro activo
+        mask = self._packed_mask(self._freeze(selections))
+        return None if mask is None else np.unpackbits(mask, count=self.n).astype(bool)
+
+    def _facet_counts(self, name, frozen):
+        codes = self.codes[name]
+        mask = self._packed_mask(frozen)
+        if mask is not None: codes = codes[np.unpackbits(mask, count=self.n).astype(bool)]
+        return np.bincount(codes[codes >= 0], minlength=len(self.categories[name]))
+
+    def options(self, name, selections=None):
+        # Valores de la faceta presentes bajo los filtros dados (cascada), en orden alfabético
+        counts = self._facet_counts(name, self._freeze(selections))
+        return [v for v, i in self.categories[name].items() if counts[i] > 0]
+
+def filtrar(df, engine, index=None, query="", selections=None, desde=None):
+    # -> posiciones de fila que pasan los filtros (en orden de relevancia si hay búsqueda),
+    #    o None si no hay ningún filtro activo. desde: solo filas nuevas o modificadas después
+    with metricas.span("filtros.facetas"):
+        mask = engine.select(selections)
+    if desde is not None:
+        with metricas.span("filtros.novedades"):
+            nuevas = (df["updated_at"] > desde).to_numpy()
+            mask = nuevas if mask is None else mask & nuevas
+    hits = None
+    if query:
+        with metricas.span("filtros.busqueda"): hits = index.search(query)
+    if hits is not None and mask is not None: return hits[mask[hits]]
+    if mask is not None: return np.flatnonzero(mask)
+    return hits
@@ -0,0 +1,75 @@
+import os
+import re
+import requests
+from types import SimpleNamespace
+from functools import cached_property
+from requests.adapters import HTTPAdapter
+from titan.config import HTTP_POOL_SIZE, HTTP_TIMEOUT, SEARCH_TIMEOUT, LLM_TIMEOUT, CONTEXT_TOKEN_BUDGET
+
+# ==============================================================================
+# CLIENTES HTTP / IA (pools de conexiones compartidos por el proceso)
+# ==============================================================================
+def pooled_session(pool_size=HTTP_POOL_SIZE):
+    session = requests.Session()
+    adapter = HTTPAdapter(pool_connections=pool_size, pool_maxsize=pool_size)
+    session.mount("https://", adapter)
+    session.mount("http://", adapter)
+    return session
+
+class ApiClients:
+    # Clientes de larga vida compartidos por el proceso: cada proveedor mantiene su pool
+    # de conexiones keep-alive, así que solo la primera petición paga el handshake TLS.
+    # La hoja solo necesita su sesión: Tavily y Groq (y sus SDK) se crean la primera vez que
+    # se investiga, así que una clave que falte no tumba la descarga ni el arranque.
+    def __init__(self, tavily_key=None, groq_key=None, pool_size=HTTP_POOL_SIZE, timeout=HTTP_TIMEOUT, search_timeout=SEARCH_TIMEOUT, llm_timeout=LLM_TIMEOUT,
+                 context_budget=CONTEXT_TOKEN_BUDGET):
+        self.timeout, self.search_timeout, self.context_budget = timeout, search_timeout, context_budget
+        self.tavily_key, self.groq_key, self.pool_size, self.llm_timeout = tavily_key, groq_key, pool_size, llm_timeout
+        self.sheets = pooled_session(pool_size)
+
+    @cached_property
+    def tavily(self):
+        from tavily import TavilyClient
+        return TavilyClient(api_key=self.tavily_key, session=pooled_session(self.pool_size))
+
+    @cached_property
+    def groq(self):
+        import httpx
+        from groq import Groq, DefaultHttpxClient
+        return Groq(api_key=self.groq_key, timeout=self.llm_timeout, http_client=DefaultHttpxClient(
+            limits=httpx.Limits(max_connections=self.pool_size, max_keepalive_connections=self.pool_size), timeout=self.llm_timeout))
+
+class StubClients:
+    # Backend local para ejecutar el pipeline sin red (api_backend = "stub" o TITAN_BACKEND=stub).
+    # La hoja sale de un CSV local y Tavily/Groq devuelven respuestas fijas con la misma forma.
+    STUB_ANALYSIS = "1. REQUISITOS TÉCNICOS OCULTOS\n- Respuesta simulada.\n2. EXCLUSIONES CLAVE\n- Respuesta simulada.\n3. ESTRATEGIA PARA GANAR\n- Respuesta simulada."
+
+    def __init__(self, csv_path=None, context_budget=CONTEXT_TOKEN_BUDGET):
+        self.timeout, self.search_timeout, self.context_budget = HTTP_TIMEOUT, SEARCH_TIMEOUT, context_budget
+        self.csv_path = csv_path
+        self.sheets = SimpleNamespace(get=self._get_sheet)
+        self.tavily = SimpleNamespace(search=self._search)
+        self.groq = SimpleNamespace(chat=SimpleNamespace(completions=SimpleNamespace(create=self._complete)))
+
+    def _get_sheet(self, url, headers=None, timeout=None):
+        if not self.csv_path: raise RuntimeError("Backend stub sin stub_sheet_csv")
+        with open(self.csv_path, "rb") as f: content = f.read()
+        return SimpleNamespace(status_code=200, content=content, headers={}, raise_for_status=lambda: None)
+
+    def _search(self, query, **kwargs):
+        return {"results": [{"url": "https://www.boe.es/stub", "content": f"Bases reguladoras simuladas. Consulta: {query}"}]}
+
+    def _complete(self, model, messages, stream=False, **kwargs):
+        if not stream: return SimpleNamespace(choices=[SimpleNamespace(message=SimpleNamespace(content=self.STUB_ANALYSIS))])
+        return (SimpleNamespace(choices=[SimpleNamespace(delta=SimpleNamespace(content=t))]) for t in re.split(r"(?<=\s)", self.STUB_ANALYSIS))
+
+def build_clients(settings=None):
+    # settings: cualquier mapping con las claves de st.secrets (también un dict en tests/benchmarks)
+    settings = settings or {}
+    budget = int(settings.get("context_token_budget", CONTEXT_TOKEN_BUDGET))
+    if os.environ.get("TITAN_BACKEND", settings.get("api_backend", "live")) == "stub":
+        return StubClients(os.environ.get("TITAN_STUB_CSV", settings.get("stub_sheet_csv")), context_budget=budget)
+    return ApiClients(settings.get("tavily_key"), settings.get("groq_key"),
+                      pool_size=int(settings.get("http_pool_size", HTTP_POOL_SIZE)), timeout=float(settings.get("http_timeout", HTTP_TIMEOUT)),
+                      search_timeout=float(settings.get("search_timeout", SEARCH_TIMEOUT)), llm_timeout=float(settings.get("llm_timeout", LLM_TIMEOUT)),
+                      context_budget=budget)
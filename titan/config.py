@@ -0,0 +1,51 @@
+import os
+
+# ==============================================================================
+# CONFIGURACIÓN GLOBAL
+# ==============================================================================
+CACHE_DIR = ".titan_cache"
+SNAPSHOT_FILE = os.path.join(CACHE_DIR, "sheet.parquet")
+SNAPSHOT_META = os.path.join(CACHE_DIR, "sheet.json")
+# Esquema canónico del dataset: campo -> (posición de la columna en la hoja, dtype).
+# El resto de columnas de la hoja se conservan con su cabecera original.
+SCHEMA = {
+    "link": (0, "string[pyarrow]"),
+    "title": (1, "string[pyarrow]"),
+    "tags": (2, "string[pyarrow]"),
+    "amount": (3, "string[pyarrow]"),
+    "deadline": (4, "string[pyarrow]"),
+    "sector": (5, "category"),
+    "analysis": (6, "string[pyarrow]"),
+    "requirements": (8, "string[pyarrow]"),
+    "probability": (9, "category"),
+    "beneficiary": (10, "category"),
+}
+DERIVED_FIELDS = ["amount_eur", "deadline_date", "row_hash", "first_seen", "updated_at"]
+SEARCH_FIELDS = {"title": 3.0, "tags": 2.0, "sector": 2.0, "analysis": 1.0, "requirements": 1.0}  # campo -> peso
+MATCH_FIELDS = {"title": 2.0, "analysis": 1.0, "requirements": 1.0}  # campo -> peso (>= 1) del índice de encaje
+MATCH_BOOST = {"sector": 0.3, "beneficiario": 0.2}  # se suma al coseno si la faceta coincide con el perfil
+STEM_LEN = 7  # raíz por prefijo del índice de encaje: "digitalizacion"/"digitales" -> "digital"
+FACET_COLUMNS = {"beneficiario": "beneficiary", "sector": "sector", "probabilidad": "probability"}
+REFRESH_INTERVAL = 600  # segundos, configurable con st.secrets["refresh_interval"]
+HTTP_POOL_SIZE = 10  # conexiones keep-alive por host
+HTTP_TIMEOUT = 10  # Google Sheets
+SEARCH_TIMEOUT = 30  # Tavily
+LLM_TIMEOUT = 60  # Groq
+RESEARCH_DB = os.path.join(CACHE_DIR, "research.sqlite")
+USERS_DB = os.path.join(CACHE_DIR, "usuarios.sqlite")
+ALERTA_DIAS = 7  # aviso de seguimientos que cierran en los próximos N días
+RESEARCH_TTL_DAYS = 30
+RESEARCH_MAX_ENTRIES = 5000
+GROQ_MODEL = "llama-3.3-70b-versatile"
+PROMPT_VERSION = "v1"  # subir al cambiar el prompt: invalida las auditorías guardadas
+RATE_LIMITS = {"tavily": (1.0, 2), "groq": (0.5, 2)}  # proveedor -> (peticiones/segundo, ráfaga)
+PREANALISIS_WORKERS = 4
+CONTEXT_TOKEN_BUDGET = 3000  # tokens de contexto web en el prompt (~4 caracteres/token)
+LOGO_FILE = "logo.png"
+CSS_FILE = os.path.join(os.path.dirname(__file__), "static", "titan.css")
+EXPORT_WORKERS = os.cpu_count() or 2
+EXPORT_PDF_FORMATS = ("zip", "pdf")  # claves de informes.EXPORT_FORMATS, sin importar fpdf
+EXPORT_PDF_UNICO_MAX = 500  # informes como máximo en el PDF único: pypdf guarda todas las páginas hasta escribir
+EXPORT_DATA_FORMATS = ("csv", "parquet", "xlsx", "jsonl")  # claves de exportacion.ESCRITORES
+EXPORT_CHUNK_ROWS = 5000  # filas por bloque al exportar datos
+SIN_AUDITORIA = "Sin auditoría IA disponible para esta convocatoria."
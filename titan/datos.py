@@ -0,0 +1,197 @@
+import io
+import os
+import re
+import json
+import hashlib
+import threading
+import numpy as np
+import pandas as pd
+from datetime import datetime
+from titan.metricas import metricas
+from titan.config import CACHE_DIR, SNAPSHOT_FILE, SNAPSHOT_META, SCHEMA, DERIVED_FIELDS, REFRESH_INTERVAL
+
+# ==============================================================================
+# DATASET: HOJA -> ESQUEMA CANÓNICO, SNAPSHOTS Y REFRESCO
+# ==============================================================================
+# Primera cuantía del texto: formato español ("1.500.000,50") y, si no encaja, inglés ("1,000,000.00").
+# Solo cuenta una cifra con separador de miles, unidad (€, EUR, euros) o multiplicador (millones/M,
+# mil/k): "Hasta 15 meses" o "(2024)" no son cuantías y se sigue buscando. Los lookarounds impiden
+# quedarse con un trozo de otra cifra o con un porcentaje.
+_UNIDAD = r"(?:€|eur(?:os)?\b)"
+_MILLONES, _MILES = r"millones|mill\b\.?|m\b", r"mil\b|k\b"
+AMOUNT_RE = (rf"(?:(?P<pre>{_UNIDAD})\s*)?(?<![\d.,])"
+             rf"(?(pre)|(?=\d{{1,3}}[.,]\d{{3}}(?!\d)|[\d.,]*\d\s*(?:{_UNIDAD}|{_MILLONES}|{_MILES})))"
+             r"(?:(?P<es>\d{1,3}(?:\.\d{3})+|\d+)(?:,(?P<es_dec>\d+))?(?![.,]?\d|\s*%)"
+             r"|(?P<en>\d{1,3}(?:,\d{3})+|\d+)(?:\.(?P<en_dec>\d+))?(?![.,]?\d|\s*%))"
+             rf"(?:\s*(?:(?P<millones>{_MILLONES})|(?P<miles>{_MILES})))?")
+
+def parse_amount(s):
+    # "Hasta 200.000 € (2024)" -> 200000.0, "2,5 M€" -> 2500000.0, "100 mil €" -> 100000.0; sin cuantía queda NaN
+    m = s.astype(str).str.extract(AMOUNT_RE, flags=re.IGNORECASE)
+    entero = m["es"].str.replace(".", "", regex=False).fillna(m["en"].str.replace(",", "", regex=False))
+    valor = pd.to_numeric(entero + "." + m["es_dec"].fillna(m["en_dec"]).fillna("0"), errors="coerce")
+    return (valor * np.select([m["millones"].notna(), m["miles"].notna()], [1e6, 1e3], 1)).astype(float)
+
+def canonicalize(df):
+    # Hoja cruda (columnas por posición) -> dataset canónico: campos con nombre, texto en
+    # Arrow, facetas categóricas y cuantía/plazo ya parseados. Es la única copia del proceso.
+    source = {}
+    for name, (pos, dtype) in SCHEMA.items():
+        if pos < df.shape[1]:
+            source[name] = df.columns[pos]
+        else:
+            df[name] = pd.NA
+            source[name] = name
+    df = df.rename(columns={v: k for k, v in source.items()})
+    for name, (pos, dtype) in SCHEMA.items():
+        s = df[name]
+        df[name] = s.where(s.isna(), s.astype(str)).astype(dtype)
+    df["amount_eur"] = parse_amount(df["amount"])
+    df["deadline_date"] = pd.to_datetime(df["deadline"], format="%d/%m/%Y", errors="coerce")
+    df["row_hash"] = row_hashes(df)
+    df.attrs["source_columns"] = source
+    return df
+
+def row_hashes(df):
+    # Hash de contenido por fila sobre los campos del esquema (estable entre procesos)
+    return pd.util.hash_pandas_object(df[list(SCHEMA)].astype(str), index=False).map("{:016x}".format).astype("string[pyarrow]")
+
+def track_changes(df_prev, df, now=None):
+    # Compara versiones por enlace BOE (columna 0) + hash de contenido. Arrastra first_seen y
+    # updated_at de la versión anterior; una fila nueva o modificada toma la hora actual.
+    # -> (df, cambios) con cambios = None si no hay versión anterior con la que comparar
+    now = pd.Timestamp(now or datetime.now())
+    if df_prev is None or "updated_at" not in df_prev.columns:
+        df["first_seen"] = df["updated_at"] = now
+        return df, None
+    prev = df_prev.drop_duplicates("link", keep="last").set_index("link")
+    igual = (df["link"].map(prev["row_hash"]) == df["row_hash"]).fillna(False).to_numpy(dtype=bool)
+    df["first_seen"] = df["link"].map(prev["first_seen"]).fillna(now)
+    df["updated_at"] = df["link"].map(prev["updated_at"]).where(igual, now)
+    enlaces = pd.Index(df["link"].dropna().unique())
+    nuevas = enlaces.difference(prev.index)
+    cambios = {"at": now.to_pydatetime(),
+               "added": nuevas.tolist(),
+               "changed": pd.Index(df.loc[~igual, "link"].dropna().unique()).difference(nuevas).tolist(),
+               "removed": prev.index.dropna().difference(enlaces).tolist()}
+    return df, cambios
+
+def export_frame(df, positions=None):
+    # Filas seleccionadas con las cabeceras originales de la hoja (sin campos derivados)
+    out = df if positions is None else df.iloc[positions]
+    source = df.attrs.get("source_columns", {})
+    return out.drop(columns=DERIVED_FIELDS).rename(columns=source)
+
+def parse_sheet(content):
+    df = pd.read_csv(io.StringIO(content.decode('utf-8')))
+    df.columns = [str(c).strip() for c in df.columns]
+    df = df.dropna(subset=[df.columns[1]]) 
+    return canonicalize(df)
+
+def read_snapshot():
+    try:
+        with open(SNAPSHOT_META, encoding='utf-8') as f: meta = json.load(f)
+        df = pd.read_parquet(SNAPSHOT_FILE)
+        # Snapshots anteriores al esquema canónico o sin seguimiento de cambios: se migran al leer
+        if "title" not in df.columns: df = canonicalize(df)
+        if "row_hash" not in df.columns: df["row_hash"] = row_hashes(df)
+        if "updated_at" not in df.columns: df["first_seen"] = df["updated_at"] = pd.Timestamp(meta.get("fetched_at") or datetime.now())
+        # La cuantía se recalcula siempre: con la hoja sin cambios (304) no habría otro reparseo
+        df["amount_eur"] = parse_amount(df["amount"])
+        return df, meta
+    except Exception: return None, {}
+
+def write_snapshot(df, meta):
+    # Escritura atómica: nunca dejamos un snapshot a medias si el proceso muere
+    try:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        if df is not None:
+            df.to_parquet(SNAPSHOT_FILE + ".tmp", index=False)
+            os.replace(SNAPSHOT_FILE + ".tmp", SNAPSHOT_FILE)
+        with open(SNAPSHOT_META + ".tmp", "w", encoding='utf-8') as f: json.dump(meta, f)
+        os.replace(SNAPSHOT_META + ".tmp", SNAPSHOT_META)
+    except Exception: pass
+
+def fetch_sheet(sid, clients, df_prev=None, meta_prev=None):
+    # Devuelve (df, meta, cambios). Lanza excepción si la red falla: el llamador decide el fallback
+    url = f"https://docs.google.com/spreadsheets/d/{sid}/export?format=csv"
+    meta_prev = meta_prev or {}
+    headers = {}
+    if df_prev is not None:
+        if meta_prev.get("etag"): headers["If-None-Match"] = meta_prev["etag"]
+        if meta_prev.get("last_modified"): headers["If-Modified-Since"] = meta_prev["last_modified"]
+    with metricas.span("hoja.descarga") as attrs:
+        r = clients.sheets.get(url, headers=headers, timeout=clients.timeout)
+        attrs["status"] = r.status_code
+    if r.status_code == 304 and df_prev is not None:
+        metricas.contar("hoja", True)
+        return df_prev, meta_prev, None
+    r.raise_for_status()
+    digest = hashlib.sha256(r.content).hexdigest()
+    meta = {"sha256": digest, "etag": r.headers.get("ETag"), "last_modified": r.headers.get("Last-Modified"), "fetched_at": datetime.now().isoformat(timespec='seconds')}
+    if df_prev is not None and digest == meta_prev.get("sha256"):
+        # Mismos bytes que el snapshot: no se vuelve a parsear ni a escribir
+        metricas.contar("hoja", True)
+        write_snapshot(None, meta)
+        return df_prev, meta, None
+    metricas.contar("hoja", False)
+    with metricas.span("hoja.parseo") as attrs:
+        df, cambios = track_changes(df_prev, parse_sheet(r.content))
+        attrs["filas"] = len(df)
+    write_snapshot(df, meta)
+    return df, meta, cambios
+
+class DatasetRefresher:
+    # Dueño del dataset en el proceso: refresca en segundo plano (stale-while-revalidate)
+    # y publica cada versión sustituyendo self.state de una sola vez. Sin background (CLI)
+    # no hay hilo: quien lo usa llama a refresh() cuando necesita la versión actual.
+    # preparar(df, version): construye los derivados de una versión (índices, modelo de las
+    # tarjetas) en este hilo antes de publicarla, así ningún rerun espera por ellos.
+    def __init__(self, sid, clients, interval=REFRESH_INTERVAL, background=True, preparar=None):
+        self.sid = sid
+        self.interval = interval
+        self.clients = clients
+        self.preparar = preparar
+        df, meta = read_snapshot()
+        self.state = {"df": df, "meta": meta, "version": meta.get("sha256"), "refreshed_at": None, "error": None, "stale": df is not None, "changes": None}
+        self.ready = threading.Event()
+        if df is not None: self.ready.set()
+        self._wake = threading.Event()
+        self._thread = threading.Thread(target=self._run, name="titan-refresher", daemon=True)
+        if background: self._thread.start()
+
+    def _run(self):
+        if self.state["df"] is not None: self._preparar(self.state["df"], self.state["version"])
+        while True:
+            self.refresh()
+            self._wake.wait(self.interval)
+            self._wake.clear()
+
+    def refresh(self):
+        prev = self.state
+        try:
+            df, meta, cambios = fetch_sheet(self.sid, self.clients, prev["df"], prev["meta"])
+            # Versión contra la que se calculó el diff: quien se sincroniza con él sabe si le vale
+            if cambios: cambios["desde"] = prev["version"]
+            version = meta.get("sha256")
+            nueva = version != prev["version"]
+            # Con una versión anterior que servir, la nueva se publica ya preparada
+            if nueva and prev["df"] is not None: self._preparar(df, version)
+            # "changes" conserva el último diff real hasta que llegue otra versión distinta
+            self.state = {"df": df, "meta": meta, "version": version, "refreshed_at": datetime.now(), "error": None, "stale": False,
+                          "changes": cambios or prev["changes"]}
+        except Exception as e:
+            # Google caído o timeout: seguimos sirviendo el último snapshot bueno
+            self.state = {**prev, "error": f"{datetime.now():%H:%M:%S} {e}", "stale": prev["df"] is not None}
+            nueva = False
+        self.ready.set()
+        # Arranque en frío sin snapshot: antes publicar que esperar a los índices
+        if nueva and prev["df"] is None: self._preparar(self.state["df"], self.state["version"])
+
+    def _preparar(self, df, version):
+        # Un fallo aquí no impide publicar: el rerun volverá a construirlo y mostrará el error
+        if self.preparar is None: return
+        try: self.preparar(df, version)
+        except Exception: pass
+
+    def trigger(self): self._wake.set()
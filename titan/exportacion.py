@@ -0,0 +1,73 @@
+import io
+import os
+import numpy as np
+import pandas as pd
+from titan.config import EXPORT_CHUNK_ROWS
+from titan.datos import export_frame
+from titan.presentacion import urgencia
+from titan.metricas import metricas
+
+# ==============================================================================
+# EXPORTACIÓN DE DATOS POR BLOQUES (CSV, Parquet, XLSX, JSON Lines)
+# ==============================================================================
+# Se genera solo al pedirla y bloque a bloque: la memoria depende de EXPORT_CHUNK_ROWS,
+# no del número de filas exportadas. pyarrow y openpyxl se importan al usarlos.
+EXPORT_MIME = {"csv": "text/csv", "parquet": "application/vnd.apache.parquet",
+               "xlsx": "application/vnd.openxmlformats-officedocument.spreadsheetml.sheet", "jsonl": "application/jsonl"}
+
+def bloques(df, positions, store=None, hoy=None, chunk=EXPORT_CHUNK_ROWS):
+    # Trozos de las filas seleccionadas con las cabeceras de la hoja. Opcionales: la auditoría IA
+    # en caché (store) y la urgencia a fecha hoy. Siempre hay al menos un bloque (cabeceras).
+    for i in range(0, max(len(positions), 1), chunk):
+        pos = positions[i:i + chunk]
+        out = export_frame(df, pos)
+        if hoy is not None:
+            plazo = df["deadline_date"].to_numpy()[pos]
+            dias = np.floor((plazo - np.datetime64(hoy)) / np.timedelta64(1, 'D'))
+            # Sin el emoji de la tarjeta: "⌛ FALTAN 12 DÍAS" -> "FALTAN 12 DÍAS"
+            out["Urgencia"] = np.char.partition(urgencia(plazo, hoy)[0].astype(str), " ")[:, 2] if len(pos) else []
+            out["Días restantes"] = pd.Series(dias, index=out.index).astype("Int64")
+        if store is not None:
+            filas = df.iloc[pos]
+            out["Auditoría IA"] = store.resultados(list(zip(filas["title"], filas["link"].astype(str), filas["row_hash"]))) if len(pos) else []
+        # Texto libre en Arrow: mismo esquema en todos los bloques aunque alguno venga vacío
+        yield out.astype({c: "string[pyarrow]" for c in out.columns if out[c].dtype == object})
+
+def _csv(partes, destino):
+    texto = io.TextIOWrapper(destino, encoding='utf-8', newline="")
+    for i, parte in enumerate(partes): parte.to_csv(texto, index=False, header=i == 0)
+    texto.detach()  # vacía el buffer sin cerrar destino
+
+def _jsonl(partes, destino):
+    for parte in partes: destino.write(parte.to_json(orient="records", lines=True, force_ascii=False).encode('utf-8'))
+
+def _parquet(partes, destino):
+    # Un row group por bloque
+    import pyarrow as pa
+    import pyarrow.parquet as pq
+    writer = None
+    for parte in partes:
+        tabla = pa.Table.from_pandas(parte, preserve_index=False)
+        if writer is None: writer = pq.ParquetWriter(destino, tabla.schema)
+        writer.write_table(tabla)
+    writer.close()
+
+def _xlsx(partes, destino):
+    # write_only: openpyxl vuelca las filas a un temporal en vez de mantener el libro en memoria
+    from openpyxl import Workbook
+    wb = Workbook(write_only=True)
+    ws = wb.create_sheet("Convocatorias")
+    for i, parte in enumerate(partes):
+        if i == 0: ws.append(list(parte.columns))
+        for fila in parte.astype(object).where(parte.notna(), None).itertuples(index=False, name=None): ws.append(fila)
+    wb.save(destino)
+
+ESCRITORES = {"csv": _csv, "parquet": _parquet, "xlsx": _xlsx, "jsonl": _jsonl}
+
+def exportar_datos(df, positions, formato, destino, store=None, hoy=None, chunk=EXPORT_CHUNK_ROWS):
+    # destino: ruta o fichero binario abierto (se deja abierto)
+    with metricas.span("exportar.datos", formato=formato, filas=len(positions)):
+        if isinstance(destino, (str, os.PathLike)):
+            with open(destino, "wb") as f: ESCRITORES[formato](bloques(df, positions, store, hoy, chunk), f)
+        else: ESCRITORES[formato](bloques(df, positions, store, hoy, chunk), destino)
+    return destino
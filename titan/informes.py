@@ -0,0 +1,145 @@
+import os
+import re
+import io
+import zipfile
+import logging
+import multiprocessing
+from collections import deque
+from itertools import islice
+from functools import lru_cache
+from concurrent.futures import ProcessPoolExecutor
+from fpdf import FPDF
+from titan.metricas import metricas
+from titan.config import LOGO_FILE, EXPORT_WORKERS, EXPORT_PDF_UNICO_MAX, SIN_AUDITORIA
+
+log = logging.getLogger("titan.informes")
+
+# ==============================================================================
+# INFORMES PDF (importable desde los procesos del pool; fpdf solo se carga aquí)
+# ==============================================================================
+
+def clean_format(text):
+    if not isinstance(text, str): return str(text)
+    text = re.sub(r'#{1,6}\s?', '', text) 
+    text = re.sub(r'\*\*(.*?)\*\*', r'\1', text) 
+    text = re.sub(r'\*(.*?)\*', r'\1', text) 
+    replacements = {'—': '-', '–': '-', '“': '"', '”': '"', '’': "'", '‘': "'", '€': 'EUR', '•': '-', '…': '...', '🔍': '->', '⚠️': '(!)', '💡': '(IDEA)', '✅': '(SI)'}
+    for k, v in replacements.items(): text = text.replace(k, v)
+    return text.encode('latin-1', 'replace').decode('latin-1')
+
+@lru_cache(maxsize=1)
+def load_logo():
+    # PNG del logo decodificado una sola vez por proceso. _parsepng y el formato de FPDF.images
+    # son de fpdf 1.7.2 (fijada en requirements.txt). Un logo ilegible se avisa y el informe sale sin él.
+    if not os.path.exists(LOGO_FILE): return None
+    try: return FPDF()._parsepng(LOGO_FILE)
+    except Exception:
+        log.warning("No se puede leer el logo %s: informes sin logo", LOGO_FILE, exc_info=True)
+        return None
+
+class PDFReport(FPDF):
+    def header(self):
+        if LOGO_FILE not in self.images:
+            logo = load_logo()
+            # Copia superficial: FPDF anota 'i'/'n' y libera 'data' en su propio dict
+            if logo: self.images[LOGO_FILE] = dict(logo, i=len(self.images) + 1)
+        if LOGO_FILE in self.images: self.image(LOGO_FILE, x=10, y=8, w=40)
+        self.set_font('Arial', 'B', 10)
+        self.set_text_color(100, 100, 100)
+        self.cell(0, 10, 'TITAN X | INFORME DE ESTRATEGIA', 0, 1, 'R')
+        self.ln(15)
+    def footer(self):
+        self.set_y(-15)
+        self.set_font('Arial', 'I', 8)
+        self.set_text_color(150, 150, 150)
+        self.cell(0, 10, f'Pagina {self.page_no()}', 0, 0, 'C')
+
+def generar_pdf(titulo, resumen, requisitos, investigacion):
+    with metricas.span("pdf.generar"):
+        pdf = PDFReport()
+        pdf.add_page()
+        pdf.set_auto_page_break(auto=True, margin=15)
+        pdf.set_font("Arial", 'B', 16)
+        pdf.set_text_color(15, 23, 42)
+        pdf.multi_cell(0, 8, clean_format(titulo.upper()), align='L')
+        pdf.ln(5)
+        pdf.set_draw_color(6, 182, 212)
+        pdf.set_line_width(0.5)
+        pdf.line(10, pdf.get_y(), 200, pdf.get_y())
+        pdf.ln(8)
+        sections = [("RESUMEN EJECUTIVO", resumen), ("REQUISITOS OFICIALES", requisitos), ("AUDITORIA ESTRATEGICA (IA)", investigacion)]
+        for title, content in sections:
+            pdf.set_font("Arial", 'B', 12)
+            pdf.set_fill_color(241, 245, 249)
+            pdf.set_text_color(0, 0, 0)
+            pdf.cell(0, 8, clean_format(title), ln=True, fill=True)
+            pdf.ln(2)
+            pdf.set_font("Arial", '', 10)
+            pdf.set_text_color(50, 50, 50)
+            pdf.multi_cell(0, 6, clean_format(content))
+            pdf.ln(5)
+        return pdf.output(dest='S').encode('latin-1')
+
+
+# ==============================================================================
+# EXPORTACIÓN MASIVA
+# ==============================================================================
+def _render(tarea):
+    nombre, titulo, resumen, requisitos, investigacion = tarea
+    return nombre, generar_pdf(str(titulo), resumen, requisitos, investigacion)
+
+def _contexto(arranque=None):
+    # Por defecto nunca fork: el servidor tiene hilos (refresher, pre-análisis, sesiones) y un hijo
+    # forkeado hereda sus locks (métricas, logging) en el estado en que estuvieran. forkserver
+    # arranca los hijos desde un proceso limpio que ya tiene este módulo (y fpdf) importado; si
+    # no existe, spawn. arranque="fork" solo para procesos de un solo hilo útil (la CLI).
+    metodos = multiprocessing.get_all_start_methods()
+    arranque = arranque if arranque in metodos else "forkserver" if "forkserver" in metodos else "spawn"
+    ctx = multiprocessing.get_context(arranque)
+    if arranque == "forkserver": ctx.set_forkserver_preload([__name__])
+    return ctx
+
+def render_lote(tareas, workers=None, arranque=None):
+    # FPDF es CPU puro (GIL): se reparte en procesos. Como mucho 2*workers informes en vuelo
+    # y se entregan en orden, así la memoria no crece con el tamaño del lote.
+    workers = workers or EXPORT_WORKERS
+    tareas = iter(tareas)
+    ctx = _contexto(arranque)
+    with ProcessPoolExecutor(max_workers=workers, mp_context=ctx) as ex:
+        en_vuelo = deque(ex.submit(_render, t) for t in islice(tareas, 2 * workers))
+        while en_vuelo:
+            resultado = en_vuelo.popleft().result()
+            for t in islice(tareas, 1): en_vuelo.append(ex.submit(_render, t))
+            yield resultado
+
+def exportar_zip(tareas, destino, workers=None, on_progress=None, arranque=None):
+    # destino: ruta o fichero binario; cada PDF se escribe en el ZIP según llega
+    with zipfile.ZipFile(destino, "w", zipfile.ZIP_DEFLATED) as zf:
+        for i, (nombre, pdf) in enumerate(render_lote(tareas, workers, arranque), 1):
+            zf.writestr(nombre, pdf)
+            if on_progress: on_progress(i)
+    return destino
+
+def exportar_pdf_unico(tareas, destino, workers=None, on_progress=None, arranque=None):
+    # Une los informes en un único PDF. Los bytes de cada informe se liberan al añadirlo,
+    # pero el escritor conserva las páginas hasta el volcado final: de ahí el tope de
+    # EXPORT_PDF_UNICO_MAX informes (los llamadores lo comprueban antes y ofrecen el ZIP).
+    from pypdf import PdfReader, PdfWriter
+    writer = PdfWriter()
+    for i, (nombre, pdf) in enumerate(render_lote(tareas, workers, arranque), 1):
+        if i > EXPORT_PDF_UNICO_MAX: raise ValueError(f"El PDF único admite como máximo {EXPORT_PDF_UNICO_MAX} informes; usa el ZIP")
+        writer.append(PdfReader(io.BytesIO(pdf)), outline_item=os.path.splitext(nombre)[0])
+        if on_progress: on_progress(i)
+    if isinstance(destino, (str, os.PathLike)):
+        with open(destino, "wb") as f: writer.write(f)
+    else: writer.write(destino)
+    return destino
+
+EXPORT_FORMATS = {"zip": exportar_zip, "pdf": exportar_pdf_unico}
+
+def tareas_informes(df, positions, store):
+    # Argumentos de generar_pdf por fila, con la auditoría IA en caché si existe
+    for pos in positions:
+        row = df.iloc[pos]
+        cached = store.get(row["title"], str(row["link"]), row["row_hash"])
+        yield (f"Informe_Titan_{df.index[pos]}.pdf", row["title"], row["analysis"], row["requirements"], cached["result"] if cached else SIN_AUDITORIA)
@@ -0,0 +1,217 @@
+import os
+import re
+import time
+import random
+import sqlite3
+import hashlib
+import threading
+import numpy as np
+from datetime import datetime
+from concurrent.futures import ThreadPoolExecutor, as_completed
+from titan.config import RESEARCH_DB, RESEARCH_TTL_DAYS, RESEARCH_MAX_ENTRIES, GROQ_MODEL, PROMPT_VERSION, RATE_LIMITS, PREANALISIS_WORKERS, CONTEXT_TOKEN_BUDGET
+from titan.busqueda import fold_text
+from titan.metricas import metricas
+
+# ==============================================================================
+# INVESTIGACIÓN IA: CACHÉ COMPARTIDA, RATE LIMIT Y PRE-ANÁLISIS
+# ==============================================================================
+class ResearchStore:
+    # Caché persistente (SQLite) de auditorías IA compartida entre sesiones, con TTL y LRU.
+    # Una entrada deja de valer si cambia el contenido de la fila, el modelo o el prompt.
+    def __init__(self, path=RESEARCH_DB, ttl_days=RESEARCH_TTL_DAYS, max_entries=RESEARCH_MAX_ENTRIES):
+        self.ttl = ttl_days * 86400
+        self.max_entries = max_entries
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("""CREATE TABLE IF NOT EXISTS research (
+                key TEXT PRIMARY KEY, titulo TEXT, link TEXT, row_hash TEXT, model TEXT,
+                prompt_version TEXT, result TEXT, created_at REAL, last_used REAL)""")
+
+    @staticmethod
+    def make_key(titulo, link):
+        return hashlib.sha256(f"{titulo}\x1f{link}".encode('utf-8')).hexdigest()
+
+    def get(self, titulo, link, row_hash=""):
+        key = self.make_key(titulo, link)
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT row_hash, model, prompt_version, result, created_at FROM research WHERE key = ?", (key,)).fetchone()
+            if row is None:
+                metricas.contar("auditorias", False)
+                return None
+            if row[0] != row_hash or row[1] != GROQ_MODEL or row[2] != PROMPT_VERSION or time.time() - row[4] > self.ttl:
+                self.conn.execute("DELETE FROM research WHERE key = ?", (key,))
+                metricas.contar("auditorias", False)
+                return None
+            self.conn.execute("UPDATE research SET last_used = ? WHERE key = ?", (time.time(), key))
+        metricas.contar("auditorias", True)
+        return {"result": row[3], "model": row[1], "prompt_version": row[2], "created_at": datetime.fromtimestamp(row[4])}
+
+    def pending(self, items):
+        # items: [(titulo, link, row_hash)] -> los que no tienen auditoría válida (una sola consulta)
+        with self.lock:
+            valid = dict(self.conn.execute("SELECT key, row_hash FROM research WHERE model = ? AND prompt_version = ? AND created_at >= ?",
+                                           (GROQ_MODEL, PROMPT_VERSION, time.time() - self.ttl)).fetchall())
+        return [it for it in items if valid.get(self.make_key(it[0], it[1])) != it[2]]
+
+    def resultados(self, items):
+        # items: [(titulo, link, row_hash)] -> [auditoría válida o None] en el mismo orden (una consulta por lote)
+        keys = [self.make_key(it[0], it[1]) for it in items]
+        with self.lock:
+            rows = self.conn.execute(f"SELECT key, row_hash, result FROM research WHERE model = ? AND prompt_version = ? AND created_at >= ? AND key IN ({','.join('?' * len(keys))})",
+                                     (GROQ_MODEL, PROMPT_VERSION, time.time() - self.ttl, *keys)).fetchall()
+        valid = {k: (h, r) for k, h, r in rows}
+        return [valid[k][1] if k in valid and valid[k][0] == it[2] else None for k, it in zip(keys, items)]
+
+    def put(self, titulo, link, row_hash, result):
+        now = time.time()
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR REPLACE INTO research VALUES (?, ?, ?, ?, ?, ?, ?, ?, ?)",
+                              (self.make_key(titulo, link), titulo, link, row_hash, GROQ_MODEL, PROMPT_VERSION, result, now, now))
+            # LRU: nos quedamos con las max_entries usadas más recientemente
+            self.conn.execute("DELETE FROM research WHERE key NOT IN (SELECT key FROM research ORDER BY last_used DESC LIMIT ?)", (self.max_entries,))
+
+class TokenBucket:
+    def __init__(self, rate, burst):
+        self.rate, self.burst = rate, burst
+        self.tokens, self.t = float(burst), time.monotonic()
+        self.lock = threading.Lock()
+
+    def acquire(self):
+        while True:
+            with self.lock:
+                now = time.monotonic()
+                self.tokens = min(self.burst, self.tokens + (now - self.t) * self.rate)
+                self.t = now
+                if self.tokens >= 1:
+                    self.tokens -= 1
+                    return
+                wait = (1 - self.tokens) / self.rate
+            time.sleep(wait)
+
+def llamar_api(provider, fn, limiters=None, retries=0, backoff=1.0):
+    # Respeta el rate limit del proveedor y reintenta con backoff exponencial + jitter
+    for intento in range(retries + 1):
+        if limiters: limiters[provider].acquire()
+        try: return fn()
+        except Exception:
+            if intento == retries: raise
+            time.sleep(backoff * 2 ** intento + random.random())
+
+def recortar_contexto(results, budget=CONTEXT_TOKEN_BUDGET):
+    # Quita fuentes y párrafos repetidos y reparte el presupuesto de tokens entre fuentes;
+    # lo que una fuente corta no gasta pasa a las más largas.
+    urls, parrafos, fuentes = set(), set(), []
+    for r in results:
+        if r.get('url') in urls: continue
+        urls.add(r.get('url'))
+        unicos = []
+        for par in re.split(r"\n+", r.get('content') or ""):
+            clave = " ".join(fold_text(par).split())
+            if not clave or clave in parrafos: continue
+            parrafos.add(clave)
+            unicos.append(par.strip())
+        if unicos: fuentes.append((r.get('url'), "\n".join(unicos)))
+    # Se reparte de la fuente más corta a la más larga y se emite en el orden original
+    restante = budget * 4
+    cuotas = {}
+    for n, i in enumerate(sorted(range(len(fuentes)), key=lambda i: len(fuentes[i][1]))):
+        cuotas[i] = min(len(fuentes[i][1]), restante // (len(fuentes) - n))
+        restante -= cuotas[i]
+    bloques = []
+    for i, (url, texto) in enumerate(fuentes):
+        if len(texto) > cuotas[i]: texto = texto[:cuotas[i]].rsplit(" ", 1)[0] + " ..."
+        bloques.append(f"Fuente: {url}\nContenido: {texto}")
+    return "\n".join(bloques)
+
+def buscar_contexto(titulo, clients, limiters=None, retries=0):
+    search_query = f"requisitos beneficiarios exclusiones bases reguladoras {titulo} oficial"
+    with metricas.span("ia.busqueda"):
+        busqueda = llamar_api("tavily", lambda: clients.tavily.search(query=search_query, search_depth="basic", max_results=3, timeout=clients.search_timeout), limiters, retries)
+    return recortar_contexto(busqueda['results'], clients.context_budget)
+
+def construir_prompt(titulo, link_boe, contexto):
+    return f"""Eres un Consultor Senior. Analiza: {titulo} ({link_boe})
+    CONTEXTO: {contexto}
+    IMPORTANTE: NO USES FORMATO MARKDOWN. NO USES '###', NI '**', NI '####'.
+    Escribe en texto plano, usando guiones para listas.
+    Responde con 3 bloques:
+    1. REQUISITOS TÉCNICOS OCULTOS
+    2. EXCLUSIONES CLAVE
+    3. ESTRATEGIA PARA GANAR
+    """
+
+def _investigar(titulo, link_boe, clients, limiters=None, retries=0):
+    prompt = construir_prompt(titulo, link_boe, buscar_contexto(titulo, clients, limiters, retries))
+    with metricas.span("ia.completion"):
+        chat = llamar_api("groq", lambda: clients.groq.chat.completions.create(model=GROQ_MODEL, messages=[{"role": "user", "content": prompt}]), limiters, retries)
+    return chat.choices[0].message.content
+
+def investigar_stream(titulo, link_boe, row_hash, store, clients):
+    # Generador para st.write_stream: emite el texto de Groq según llega y lo guarda al terminar
+    cached = store.get(titulo, link_boe, row_hash)
+    if cached:
+        yield cached["result"]
+        return
+    partes = []
+    try:
+        prompt = construir_prompt(titulo, link_boe, buscar_contexto(titulo, clients))
+        # El span cubre el stream completo (lo que espera el usuario), no solo el primer token
+        with metricas.span("ia.completion", stream=True):
+            for chunk in clients.groq.chat.completions.create(model=GROQ_MODEL, messages=[{"role": "user", "content": prompt}], stream=True):
+                delta = chunk.choices[0].delta.content if chunk.choices else None
+                if delta:
+                    partes.append(delta)
+                    yield delta
+    except Exception as e:
+        yield f"Error en la investigación: {str(e)}"
+        return
+    store.put(titulo, link_boe, row_hash, "".join(partes))
+
+def seleccionar_para_preanalisis(df, store, solo_nuevas=True, prob=None, dias=None, positions=None):
+    # -> [(titulo, link_boe, row_hash)] de las filas que cumplen el criterio; con positions, solo
+    #    esas filas y en ese orden (p. ej. las de mejor encaje con un perfil)
+    mask = np.ones(len(df), dtype=bool)
+    if prob: mask &= df["probability"].astype(str).str.contains(prob, case=False).to_numpy()
+    if dias is not None:
+        deadline = df["deadline_date"].to_numpy()
+        hoy = np.datetime64(datetime.now().date())
+        mask &= (deadline >= hoy) & (deadline <= hoy + np.timedelta64(dias, 'D'))
+    sel = df[mask] if positions is None else df.iloc[positions[mask[positions]]]
+    items = list(zip(sel["title"].astype(str), sel["link"].astype(str), sel["row_hash"].astype(str)))
+    return store.pending(items) if solo_nuevas else items
+
+def preanalizar(items, store, clients, workers=PREANALISIS_WORKERS, retries=3, on_progress=None):
+    # Auditoría IA concurrente; los resultados van a la caché compartida que lee la UI
+    limiters = {p: TokenBucket(*RATE_LIMITS[p]) for p in RATE_LIMITS}
+    resumen = {"ok": 0, "errores": 0}
+    def tarea(titulo, link, row_hash):
+        store.put(titulo, link, row_hash, _investigar(titulo, link, clients, limiters, retries))
+    with ThreadPoolExecutor(max_workers=workers) as ex:
+        futuros = {ex.submit(tarea, *it): it for it in items}
+        for i, fut in enumerate(as_completed(futuros), 1):
+            err = fut.exception()
+            resumen["errores" if err else "ok"] += 1
+            if on_progress: on_progress(i, len(items), futuros[fut][0], err)
+    return resumen
+
+class PreanalisisJob:
+    # Un pre-análisis en segundo plano por proceso; la UI solo consulta self.state
+    def __init__(self):
+        self.state = {"running": False, "done": 0, "total": 0, "ok": 0, "errores": 0, "last_error": None, "finished_at": None}
+
+    def start(self, items, store, clients, workers=PREANALISIS_WORKERS):
+        if self.state["running"]: return False
+        self.state = {"running": True, "done": 0, "total": len(items), "ok": 0, "errores": 0, "last_error": None, "finished_at": None}
+        threading.Thread(target=self._run, args=(items, store, clients, workers), name="titan-preanalisis", daemon=True).start()
+        return True
+
+    def _progress(self, i, total, titulo, err):
+        self.state = {**self.state, "done": i, "ok": self.state["ok"] + (not err), "errores": self.state["errores"] + bool(err),
+                      "last_error": f"{titulo}: {err}" if err else self.state["last_error"]}
+
+    def _run(self, items, store, clients, workers):
+        try: preanalizar(items, store, clients, workers, on_progress=self._progress)
+        except Exception as e: self.state = {**self.state, "last_error": str(e)}
+        self.state = {**self.state, "running": False, "finished_at": datetime.now()}
@@ -0,0 +1,99 @@
+import os
+import json
+import time
+import logging
+import threading
+import numpy as np
+from datetime import datetime
+from functools import wraps
+from contextlib import contextmanager
+from collections import deque, defaultdict
+
+# ==============================================================================
+# MÉTRICAS: SPANS DE TIEMPO Y CONTADORES HIT/MISS (sin Streamlit)
+# ==============================================================================
+# Siempre activas: un span cuesta dos perf_counter y un append. El JSON solo se serializa
+# si el logger "titan.metricas" tiene destino (TITAN_METRICS_LOG o st.secrets["metrics_log"]).
+VENTANA_METRICAS = 500  # muestras por span para los percentiles
+log = logging.getLogger("titan.metricas")
+
+class Metricas:
+    def __init__(self, ventana=VENTANA_METRICAS):
+        self.lock = threading.Lock()
+        self.duraciones = defaultdict(lambda: deque(maxlen=ventana))
+        self.contadores = defaultdict(lambda: {"hit": 0, "miss": 0})
+        self._local = threading.local()
+
+    @contextmanager
+    def span(self, nombre, **attrs):
+        # attrs se puede completar dentro del bloque (p. ej. número de filas resultantes)
+        t = time.perf_counter()
+        try: yield attrs
+        finally: self.registrar(nombre, time.perf_counter() - t, attrs)
+
+    def registrar(self, nombre, segundos, attrs=None):
+        with self.lock: self.duraciones[nombre].append(segundos)
+        traza = getattr(self._local, "traza", None)
+        if traza is not None: traza["spans"].append((nombre, segundos, attrs or {}))
+        if log.isEnabledFor(logging.INFO):
+            self._log({"span": nombre, "ms": round(segundos * 1000, 3), **(attrs or {})})
+
+    def contar(self, nombre, acierto):
+        clave = "hit" if acierto else "miss"
+        with self.lock: self.contadores[nombre][clave] += 1
+        traza = getattr(self._local, "traza", None)
+        if traza is not None: traza["caches"][nombre][clave] += 1
+        if log.isEnabledFor(logging.INFO): self._log({"cache": nombre, "hit": acierto})
+
+    def _log(self, evento):
+        evento = {"ts": datetime.now().isoformat(timespec='milliseconds'), "hilo": threading.current_thread().name, **evento}
+        log.info(json.dumps(evento, ensure_ascii=False, default=str))
+
+    def cacheada(self, nombre, cache):
+        # Envuelve un decorador de caché (st.cache_resource, st.cache_data, lru_cache...): el cuerpo
+        # solo corre en miss, así que basta con marcarlo ahí para contar cada llamada.
+        def deco(fn):
+            @wraps(fn)
+            def cuerpo(*args, **kwargs):
+                self._local.miss = True
+                return fn(*args, **kwargs)
+            cached = cache(cuerpo)
+            @wraps(fn)
+            def llamada(*args, **kwargs):
+                # Guardamos el flag del llamador: las cachés pueden anidarse (presentación -> RowCache)
+                previo, self._local.miss = getattr(self._local, "miss", False), False
+                try: return cached(*args, **kwargs)
+                finally:
+                    self.contar(nombre, not self._local.miss)
+                    self._local.miss = previo
+            llamada.clear = cached.clear
+            return llamada
+        return deco
+
+    # --- Traza por rerun (hilo del script de Streamlit) ---
+    def iniciar_traza(self):
+        self._local.traza = {"inicio": time.perf_counter(), "spans": [], "caches": defaultdict(lambda: {"hit": 0, "miss": 0})}
+        return self._local.traza
+
+    def traza(self):
+        return getattr(self._local, "traza", None)
+
+    def percentiles(self, qs=(50, 90, 99)):
+        # -> {span: {"n": muestras, "p50": ms, ...}} sobre la ventana móvil
+        with self.lock: muestras = {k: np.array(v) for k, v in self.duraciones.items() if v}
+        return {k: {"n": len(v), **{f"p{q}": float(np.percentile(v, q)) * 1000 for q in qs}} for k, v in sorted(muestras.items())}
+
+    def resumen_caches(self):
+        with self.lock: return {k: dict(v) for k, v in sorted(self.contadores.items())}
+
+def configurar_log(destino=None):
+    # destino: ruta de fichero JSONL o "stderr"; sin destino el log queda apagado (coste cero)
+    destino = destino or os.environ.get("TITAN_METRICS_LOG")
+    if not destino or log.handlers: return
+    handler = logging.StreamHandler() if destino == "stderr" else logging.FileHandler(destino, encoding='utf-8')
+    handler.setFormatter(logging.Formatter("%(message)s"))
+    log.addHandler(handler)
+    log.setLevel(logging.INFO)
+    log.propagate = False
+
+metricas = Metricas()
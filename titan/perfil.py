@@ -0,0 +1,60 @@
+import numpy as np
+import pandas as pd
+from titan.config import MATCH_FIELDS, MATCH_BOOST
+from titan.busqueda import TOKEN_RE, fold_text, stem_tokens, tokenize_rows
+from titan.metricas import metricas
+
+# ==============================================================================
+# ENCAJE CON UN PERFIL DE EMPRESA (TF-IDF local, sin modelos externos)
+# ==============================================================================
+class MatchIndex:
+    # TF-IDF con tf sublineal y filas normalizadas (L2) sobre título, análisis y requisitos, en el
+    # mismo formato CSR que SearchIndex: puntuar un perfil es un único bincount sobre los postings
+    # de sus términos. Los tokens por fila salen de RowCache.match_postings (incremental por row_hash).
+    def __init__(self, df, row_postings=None):
+        self.n = len(df)
+        row_postings = tokenize_rows(df, MATCH_FIELDS, stem=True) if row_postings is None else row_postings
+        postings = row_postings.groupby(["tok", "row"])["w"].sum()
+        if postings.empty: postings.index = pd.MultiIndex.from_arrays([[], []], names=["tok", "row"])
+        vocab, starts = np.unique(np.asarray(postings.index.get_level_values(0), dtype=object), return_index=True)
+        self.vocab = {t: i for i, t in enumerate(vocab)}
+        self.offsets = np.append(starts.astype(np.int64), len(postings))
+        self.rows = postings.index.get_level_values(1).to_numpy(dtype=np.int32)
+        doc_freq = np.diff(self.offsets)
+        self.idf = np.log((1 + self.n) / (1 + doc_freq)) + 1
+        w = (1 + np.log(postings.to_numpy(dtype=np.float64))) * np.repeat(self.idf, doc_freq)
+        norma = np.sqrt(np.bincount(self.rows, weights=w ** 2, minlength=self.n))
+        self.weights = (w / np.maximum(norma[self.rows], 1e-12)).astype(np.float32)
+
+    def similitud(self, texto):
+        # -> coseno entre el texto y cada fila (float64[n]); ceros si no comparte ningún término
+        tf = stem_tokens(pd.Series(TOKEN_RE.findall(fold_text(texto)), dtype=object)).value_counts()
+        terminos = [(self.vocab[t], c) for t, c in tf.items() if t in self.vocab]
+        if not terminos: return np.zeros(self.n)
+        ids = np.array([i for i, _ in terminos])
+        q = (1 + np.log(np.array([c for _, c in terminos], dtype=np.float64))) * self.idf[ids]
+        q /= np.linalg.norm(q)
+        tramos = [np.arange(self.offsets[i], self.offsets[i + 1]) for i in ids]
+        sel = np.concatenate(tramos)
+        return np.bincount(self.rows[sel], weights=self.weights[sel] * np.repeat(q, [len(t) for t in tramos]), minlength=self.n)
+
+def perfil_vacio(perfil):
+    return not any(perfil.values())
+
+def puntuar_perfil(index, engine, perfil):
+    # perfil: {"sector": [...], "tamano": valor de beneficiario o None, "region": str, "descripcion": str}
+    # -> (posiciones con encaje > 0 de mayor a menor, encaje en [0, 1] de todas las filas)
+    with metricas.span("perfil.ranking"):
+        sectores = list(perfil.get("sector") or [])
+        # La región pesa doble: una convocatoria de otra comunidad casi nunca sirve
+        texto = " ".join([perfil.get("descripcion") or "", *sectores, *[perfil.get("region") or ""] * 2])
+        score = index.similitud(texto)
+        maximo = 1.0
+        for faceta, valores in (("sector", sectores), ("beneficiario", [perfil["tamano"]] if perfil.get("tamano") else [])):
+            codigos = [engine.categories[faceta][v] for v in valores if v in engine.categories[faceta]]
+            if not codigos: continue
+            score = score + MATCH_BOOST[faceta] * np.isin(engine.codes[faceta], codigos)
+            maximo += MATCH_BOOST[faceta]
+        score /= maximo
+        hits = np.flatnonzero(score > 0)
+        return hits[np.argsort(-score[hits], kind='stable')], score
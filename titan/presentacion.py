@@ -0,0 +1,139 @@
+import os
+import numpy as np
+import pandas as pd
+from functools import lru_cache
+from titan.config import CSS_FILE, LOGO_FILE
+from titan.busqueda import RowCache, fold_text
+
+# ==============================================================================
+# PRESENTACIÓN: TARJETAS, IMÁGENES, ANALÍTICA Y ESTÁTICOS
+# ==============================================================================
+def get_tag_bg(tag):
+    t = tag.lower()
+    if "next" in t: return "background: linear-gradient(90deg, #2563eb, #1d4ed8);"
+    if "subvenc" in t: return "background: linear-gradient(90deg, #059669, #047857);"
+    if "prestamo" in t: return "background: linear-gradient(90deg, #d97706, #b45309);"
+    if "bonif" in t: return "background: linear-gradient(90deg, #7c3aed, #6d28d9);"
+    return "background: #475569;"
+
+IMG_BASE_PARAMS = "?auto=format&fit=crop&w=800&q=80"
+IMG_DEFAULT = "photo-1497215728101-856f4ea42174"
+# (palabras clave, foto) en orden de prioridad: gana la primera categoría con coincidencia
+IMG_RULES = [
+    (['dana', 'catastrofe', 'emergencia', 'inundaci'], "photo-1639164631388-857f29935861"),
+    (['eolic', 'viento', 'aerogenerador', 'wind'], "photo-1548337138-e87d889cc369"),
+    (['solar', 'fotov', 'placas'], "photo-1756913454593-ac5cab482a7a"),
+    (['moves', 'coche', 'vehiculo', 'puntos de recarga', 'automocion'], "photo-1596731498067-99aeb581d3d7"),
+    (['salud', 'sanitar', 'farma', 'medic', 'hospital', 'cancer'], "photo-1532938911079-1b06ac7ceec7"),
+    (['indust', 'manufac', 'fabrica', 'maquina', 'cadena de valor'], "photo-1581091226825-a6a2a5aee158"),
+    (['educa', 'formaci', 'universidad', 'beca', 'lector', 'curso', 'fp', 'profesional'], "photo-1524178232363-1fb2b075b655"),
+    (['digital', 'ia ', 'softw', 'tic', 'cyber', 'ciber'], "photo-1580894894513-541e068a3e2b"),
+    (['agro', 'campo', 'forest', 'ganad', 'rural'], "photo-1625246333195-78d9c38ad449"),
+    (['turis', 'hotel', 'viaje', 'hostel'], "photo-1551882547-ff40c63fe5fa"),
+    (['construc', 'vivienda', 'rehab', 'edific'], "photo-1503387762-592deb58ef4e"),
+    (['maritimo', 'naval', 'barco', 'puerto', 'portuari', 'mercancia', 'transporte'], "photo-1606185540834-d6e7483ee1a4"),
+    (['hidro', 'repotencia', 'central', 'presa', 'agua'], "photo-1642915064502-f9cfb135f347"),
+    (['startup', 'emprende', 'idi', 'innovacion', 'tecnologic', 'investig'], "photo-1519389950473-47ba0277781c"),
+    (['cultur', 'patrimonio', 'historic', 'archivo', 'museo', 'arte'], "photo-1765984990058-2f4a880bf9af"),
+    (['paviment', 'calle', 'obra', 'asfalt', 'urbaniz'], "photo-1762438441472-be21c5148e8a"),
+    (['gas', 'combustible', 'hidrogeno', 'renovable', 'biogas'], "photo-1654334036171-e01e52b2ce8e"),
+    (['asesora', 'consultor', 'transformacion', 'kit digital'], "photo-1454165804606-c3d57bc86b40"),
+    (['joven', 'juvenil', 'estudiante', 'egresado', 'asociaci', 'federacion'], "photo-1523240795612-9a054b0db644"),
+]
+IMG_URLS = [f"https://images.unsplash.com/{photo}{IMG_BASE_PARAMS}" for _, photo in IMG_RULES] + [f"https://images.unsplash.com/{IMG_DEFAULT}{IMG_BASE_PARAMS}"]
+
+def img_category(text):
+    # text ya en minúsculas y sin acentos; devuelve índice en IMG_URLS. Búsquedas de subcadena
+    # en orden de prioridad: mucho más rápido que un regex que prueba todas las claves en cada carácter.
+    for i, (kws, _) in enumerate(IMG_RULES):
+        if any(k in text for k in kws): return i
+    return len(IMG_RULES)
+
+def get_img_url(sector, titulo):
+    return IMG_URLS[img_category(fold_text(str(sector) + " " + str(titulo)))]
+    
+
+def render_tags(tags_raw):
+    return "".join([f"<span class='titan-tag' style='{get_tag_bg(t.strip())}'>{t.strip()}</span>" for t in str(tags_raw).split('|') if t.strip()])
+
+def presentacion(df, row_cache=None):
+    # Modelo de presentación de una versión del dataset (posición de fila = posición en df):
+    # todo lo que la tarjeta deriva de la fila y no depende del día de hoy.
+    prob = df["probability"].astype(str).str.strip().str.upper()
+    alta, media = prob.str.contains("ALTA"), prob.str.contains("MEDIA")
+    tags = df["tags"].astype(str)
+    tags_unicos = {t: render_tags(t) for t in tags.unique()}
+    return pd.DataFrame({
+        "deadline": df["deadline_date"].to_numpy(),
+        "amount": -df["amount_eur"].to_numpy(),
+        "prob_rank": np.select([alta, media], [0, 1], 2),
+        "probabilidad": prob.to_numpy(),
+        "badge_border": np.select([alta, media], ["rgba(16, 185, 129, 0.5)", "rgba(245, 158, 11, 0.5)"], "rgba(148, 163, 184, 0.5)"),
+        "img_url": np.take(IMG_URLS, (row_cache or RowCache()).img_categories(df, img_category)),
+        "tags_html": tags.map(tags_unicos).to_numpy(),
+    })
+
+def urgencia(deadline, now):
+    # Vectorizado sobre las tarjetas visibles -> (etiqueta, clase, estilo del plazo)
+    dias = np.floor((deadline - np.datetime64(now)) / np.timedelta64(1, 'D'))
+    sin_fecha, cerrada, inminente = np.isnan(dias), dias < 0, dias <= 7
+    faltan = np.char.add(np.char.add("⌛ FALTAN ", np.nan_to_num(dias).astype(np.int64).astype(str)), " DÍAS")
+    label = np.select([sin_fecha, cerrada, inminente], ["ℹ️ CONVOCATORIA ABIERTA", "🚫 FUERA DE PLAZO", "🚨 CIERRE INMINENTE"], faltan)
+    clase = np.select([sin_fecha, cerrada, inminente], ["", "border-color: #64748b;", "blink-urgent"], "")
+    estilo = np.select([sin_fecha, cerrada, inminente], ["", "color: #94a3b8; text-decoration: line-through;", "color: var(--urgent-red); font-weight: 900;"], "")
+    return label, clase, estilo
+
+def orden_plazo(deadline, now):
+    # Orden "Plazo de cierre" (argsort): abiertas por fecha de cierre, luego sin plazo y al final
+    # las ya cerradas, la más reciente primero. Mismo corte de "cerrada" que urgencia.
+    dias = np.floor((deadline - np.datetime64(now)) / np.timedelta64(1, 'D'))
+    grupo = np.select([dias >= 0, np.isnan(dias)], [0, 1], 2)
+    return np.lexsort((np.where(grupo == 2, -dias, np.nan_to_num(dias)), grupo))
+
+def agregados(engine, vista, df, positions):
+    # KPIs y analítica de una selección: bincount sobre los códigos categóricos que ya
+    # tiene el motor de filtros, sin value_counts
+    def por_categoria(name, weights=None):
+        codes = engine.codes[name][positions]
+        validos = codes >= 0
+        counts = np.bincount(codes[validos], weights=None if weights is None else weights[validos], minlength=len(engine.categories[name]))
+        return pd.Series(counts, index=list(engine.categories[name]))
+    plazos = vista["deadline"].to_numpy()[positions]
+    meses, n_meses = np.unique(plazos[~np.isnat(plazos)].astype("datetime64[M]"), return_counts=True)
+    return {
+        "total": len(positions),
+        "alta": int(np.bincount(vista["prob_rank"].to_numpy()[positions], minlength=3)[0]),
+        "sector": por_categoria("sector"),
+        "cuantia_sector": por_categoria("sector", np.nan_to_num(df["amount_eur"].to_numpy(dtype=float)[positions])),
+        "probabilidad": por_categoria("probabilidad").drop("nan", errors="ignore"),
+        "plazos": pd.Series(n_meses, index=pd.DatetimeIndex(meses)),
+    }
+
+def figuras_analitica(agg):
+    # plotly se importa con el primer panel abierto, no al arrancar la app
+    import plotly.express as px
+    layout = dict(height=350, margin=dict(l=20, r=20, t=40, b=20), paper_bgcolor="rgba(0,0,0,0)", plot_bgcolor="rgba(0,0,0,0)", showlegend=False)
+    sector = agg["sector"][agg["sector"] > 0].sort_values(ascending=False, kind="stable")
+    fig1 = px.pie(values=sector.to_numpy(), names=sector.index, hole=0.6, color_discrete_sequence=px.colors.sequential.Bluyl)
+    fig1.update_layout(title_text="Distribución por Sector", **layout)
+    prob = agg["probabilidad"][agg["probabilidad"] > 0].sort_values(ascending=False, kind="stable")
+    fig2 = px.bar(x=prob.index, y=prob.to_numpy(), color=prob.index, labels={"x": "Probabilidad", "y": "Count"}, color_discrete_sequence=px.colors.qualitative.Bold)
+    fig2.update_layout(title_text="Análisis de Probabilidad", **layout)
+    cuantia = agg["cuantia_sector"][agg["sector"] > 0].sort_values(ascending=False, kind="stable")
+    fig3 = px.bar(x=cuantia.index, y=cuantia.to_numpy(), labels={"x": "Sector", "y": "Cuantía (€)"}, color_discrete_sequence=px.colors.sequential.Bluyl[-1:])
+    fig3.update_layout(title_text="Cuantía Disponible por Sector", **layout)
+    plazos = agg["plazos"]
+    fig4 = px.bar(x=plazos.index, y=plazos.to_numpy(), labels={"x": "Mes de cierre", "y": "Convocatorias"}, color_discrete_sequence=px.colors.qualitative.Bold)
+    fig4.update_layout(title_text="Calendario de Cierres", **layout)
+    fig4.update_xaxes(dtick="M1", tickformat="%b %Y")
+    return fig1, fig2, fig3, fig4
+
+@lru_cache(maxsize=1)
+def estilos():
+    # Hoja de estilos de la app, leída una vez por proceso
+    with open(CSS_FILE, encoding='utf-8') as f: return f"<style>\n{f.read()}</style>"
+
+@lru_cache(maxsize=1)
+def logo_bytes():
+    if not os.path.exists(LOGO_FILE): return None
+    with open(LOGO_FILE, "rb") as f: return f.read()
@@ -0,0 +1,40 @@
+import os
+import time
+import sqlite3
+import threading
+from datetime import datetime
+from titan.config import USERS_DB
+
+# ==============================================================================
+# ESTADO POR USUARIO
+# ==============================================================================
+class UserStore:
+    # Estado por usuario persistente entre sesiones (SQLite): última visita y convocatorias seguidas
+    def __init__(self, path=USERS_DB):
+        self.lock = threading.Lock()
+        os.makedirs(os.path.dirname(path), exist_ok=True)
+        self.conn = sqlite3.connect(path, check_same_thread=False)
+        with self.lock, self.conn:
+            self.conn.execute("CREATE TABLE IF NOT EXISTS visits (user TEXT PRIMARY KEY, last_visit REAL)")
+            # Seguimientos por enlace BOE: el mismo identificador que usa track_changes entre versiones
+            self.conn.execute("CREATE TABLE IF NOT EXISTS watchlist (user TEXT, link TEXT, title TEXT, created_at REAL, PRIMARY KEY (user, link))")
+
+    def touch_visit(self, user):
+        # Registra la visita actual y devuelve la anterior (None si es la primera)
+        with self.lock, self.conn:
+            row = self.conn.execute("SELECT last_visit FROM visits WHERE user = ?", (user,)).fetchone()
+            self.conn.execute("INSERT OR REPLACE INTO visits (user, last_visit) VALUES (?, ?)", (user, time.time()))
+        return datetime.fromtimestamp(row[0]) if row else None
+
+    def follow(self, user, link, title):
+        with self.lock, self.conn:
+            self.conn.execute("INSERT OR IGNORE INTO watchlist VALUES (?, ?, ?, ?)", (user, link, title, time.time()))
+
+    def unfollow(self, user, link):
+        with self.lock, self.conn:
+            self.conn.execute("DELETE FROM watchlist WHERE user = ? AND link = ?", (user, link))
+
+    def watchlists(self):
+        # -> [(user, link, title)] de todos los usuarios; el motor de alertas los carga una vez por proceso
+        with self.lock:
+            return self.conn.execute("SELECT user, link, title FROM watchlist ORDER BY user, created_at").fetchall()